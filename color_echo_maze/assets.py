@@ -0,0 +1,56 @@
+"""Background loading for sounds, fonts and other assets.
+
+AssetLoader runs every load on one background thread and keeps a future per
+asset, so the game can draw its first frame straight away and start using
+each asset as soon as it is ready.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AssetLoader:
+    """Loads assets off the main thread, each under a key such as ('sound', 'move')"""
+
+    def __init__(self):
+        # The thread starts with the first load
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='asset-loader')
+        self.futures = {}
+
+    def load(self, key, loader, *args):
+        """Start loading an asset with loader(*args), unless it was already requested; returns its future"""
+        future = self.futures.get(key)
+        if future is None:
+            future = self.executor.submit(loader, *args)
+            future.add_done_callback(lambda done: self.report_failure(key, done))
+            self.futures[key] = future
+        return future
+
+    @staticmethod
+    def report_failure(key, future):
+        if not future.cancelled() and future.exception() is not None:
+            print(f"Warning: Could not load {key}. Error: {future.exception()}")
+
+    def ready(self, key):
+        """Whether the asset has finished loading, successfully or not"""
+        future = self.futures.get(key)
+        return future is not None and future.done()
+
+    def get(self, key, default=None):
+        """Return the asset if it loaded successfully, else default"""
+        future = self.futures.get(key)
+        if future is None or not future.done() or future.cancelled() or future.exception() is not None:
+            return default
+        return future.result()
+
+    def wait(self, timeout=None):
+        """Block until every requested asset has finished loading, e.g. before a benchmark"""
+        for future in list(self.futures.values()):
+            try:
+                future.exception(timeout)
+            except Exception:
+                pass
+
+    def shutdown(self):
+        # Cancelled by hand, as shutdown(cancel_futures=True) needs Python 3.9
+        for future in self.futures.values():
+            future.cancel()
+        self.executor.shutdown(wait=False)
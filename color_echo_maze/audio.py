@@ -0,0 +1,82 @@
+"""Sound playback through a fixed pool of mixer channels.
+
+Every sound belongs to a category with its own reserved channels, so a burst
+of footsteps can never take the channels that pulse or level sounds need.
+Each sound also has a cap on how many copies of it play at once, and repeats
+of a sound within a short window are merged into one. Each sound is decoded
+once and that one buffer is shared by every play.
+"""
+import time
+
+import pygame
+
+# Plays of the same sound closer together than this many seconds are merged
+COALESCE_WINDOW = 0.05
+
+
+class AudioManager:
+    """Plays sounds loaded through an AssetLoader on per-category reserved channels"""
+
+    def __init__(self, assets, channels, settings, clock=time.perf_counter):
+        """channels maps category -> reserved channel count; settings maps sound -> (category, max voices)"""
+        self.assets = assets
+        self.settings = settings
+        self.clock = clock
+        self.enabled = bool(pygame.mixer.get_init())
+
+        # Channel objects by index, and the indices reserved for each category
+        self.channels = []
+        self.categories = {}
+        if self.enabled:
+            total = sum(channels.values())
+            pygame.mixer.set_num_channels(total)
+            # pygame's own channel picking (Sound.play) never touches reserved channels
+            pygame.mixer.set_reserved(total)
+            for category, count in channels.items():
+                first = len(self.channels)
+                self.channels.extend(pygame.mixer.Channel(index) for index in range(first, first + count))
+                self.categories[category] = range(first, first + count)
+
+        # Sound last started on each channel, and when
+        self.playing = [None] * len(self.channels)
+        self.started = [0.0] * len(self.channels)
+        self.last_played = {}
+
+    def load(self, files):
+        """Start decoding each sound (name -> path) in the background"""
+        if not self.enabled:
+            return
+        for name, path in files.items():
+            self.assets.load(('sound', name), pygame.mixer.Sound, path)
+
+    def play(self, name):
+        """Play a sound if it has loaded; returns whether it was started"""
+        if not self.enabled:
+            return False
+        sound = self.assets.get(('sound', name))
+        if sound is None:
+            return False
+
+        now = self.clock()
+        last = self.last_played.get(name)
+        if last is not None and now - last < COALESCE_WINDOW:
+            return False
+
+        category, max_voices = self.settings[name]
+        reserved = self.categories[category]
+        voices = [index for index in reserved
+                  if self.playing[index] == name and self.channels[index].get_busy()]
+        if len(voices) >= max_voices:
+            # Restart this sound's oldest voice rather than adding another
+            target = min(voices, key=self.started.__getitem__)
+        else:
+            # A free channel in the category, or else the one playing longest
+            target = next((index for index in reserved if not self.channels[index].get_busy()), None)
+            if target is None:
+                target = min(reserved, key=self.started.__getitem__)
+
+        self.channels[target].play(sound)
+        self.playing[target] = name
+        self.started[target] = now
+        self.last_played[name] = now
+        return True
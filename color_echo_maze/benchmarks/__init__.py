@@ -0,0 +1,5 @@
+"""Performance benchmarks for Color Echo Maze.
+
+Run from the color_echo_maze directory: ``python -m benchmarks --help`` for the
+full suite, or ``python -m benchmarks.generation`` for generation scaling alone.
+"""
@@ -0,0 +1,65 @@
+"""Command line entry point: ``python -m benchmarks [options]`` from the color_echo_maze directory."""
+import argparse
+import json
+import platform
+import sys
+
+from benchmarks.suite import BENCHMARKS, compare, run_suite
+
+
+def format_params(params):
+    return ' '.join(f"{key}={value}" for key, value in params.items())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description="Benchmark maze generation, visibility, moving walls and rendering.")
+    parser.add_argument('names', nargs='*', metavar='NAME',
+                        help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--quick', action='store_true', help="run a small sweep, e.g. for CI")
+    parser.add_argument('--repeats', type=int, default=5, help="timed repeats per parameter set (default: 5)")
+    parser.add_argument('--output', help="write results as JSON to this file ('-' for stdout)")
+    parser.add_argument('--baseline', help="JSON results to compare against; exits with status 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help="allowed slowdown against the baseline as a fraction (default: 0.25)")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+    
+    def report(record):
+        print(f"{record['name']:<20} {format_params(record['params']):<36} "
+              f"{record['seconds'] * 1e3:>10.3f} ms {record['peak_memory_kib']:>10.1f} KiB",
+              file=sys.stderr)
+    
+    results = run_suite(args.names, args.quick, args.repeats, report)
+    document = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'results': results,
+    }
+    
+    if args.output == '-':
+        json.dump(document, sys.stdout, indent=2)
+        print()
+    elif args.output:
+        with open(args.output, 'w') as f:
+            json.dump(document, f, indent=2)
+    
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for record, old, ratio in regressions:
+            print(f"REGRESSION {record['name']} {format_params(record['params'])}: "
+                  f"{old['seconds'] * 1e3:.3f} ms -> {record['seconds'] * 1e3:.3f} ms ({ratio:.2f}x)",
+                  file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}", file=sys.stderr)
+    
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,32 @@
+"""Compare the step throughput of BatchedMazeEnv with a loop over MazeEnvs."""
+import os
+import time
+
+# Only the simulation is needed; see main.HEADLESS
+os.environ.setdefault('COLOR_ECHO_MAZE_HEADLESS', '1')
+
+from benchmarks.suite import bench_env_step
+
+ENV_COUNTS = [1, 4, 16, 64, 256]
+STEPS = 200
+
+
+def steps_per_second(envs, batched, steps=STEPS):
+    """Return maze steps per second over steps calls that each step every maze once"""
+    step = bench_env_step(envs, batched)
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    return envs * steps / (time.perf_counter() - start)
+
+
+def main():
+    print(f"{'mazes':>6} {'loop steps/s':>13} {'batched steps/s':>16} {'speedup':>8}")
+    for envs in ENV_COUNTS:
+        single = steps_per_second(envs, batched=False)
+        batched = steps_per_second(envs, batched=True)
+        print(f"{envs:>6} {single:>13.0f} {batched:>16.0f} {batched / single:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
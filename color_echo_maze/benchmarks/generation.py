@@ -0,0 +1,37 @@
+"""Benchmark how maze generation time grows with the number of cells."""
+import os
+import time
+
+# Only the maze is needed; see main.HEADLESS
+os.environ.setdefault('COLOR_ECHO_MAZE_HEADLESS', '1')
+
+from main import Maze
+
+# (width, height) pairs with roughly doubling cell counts
+SIZES = [(40, 30), (60, 45), (80, 60), (120, 90), (160, 120), (240, 180)]
+REPEATS = 3
+
+
+def time_generation(width, height, level=5, repeats=REPEATS):
+    """Return the best generation time in seconds over a few seeded runs"""
+    best = None
+    for seed in range(repeats):
+        start = time.perf_counter()
+        Maze(width, height, level, seed=seed)
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main():
+    print(f"{'size':>10} {'cells':>8} {'seconds':>10} {'us/cell':>8}")
+    for width, height in SIZES:
+        cells = width * height
+        elapsed = time_generation(width, height)
+        # A flat us/cell column means generation time grows linearly with cell count
+        print(f"{width:>4}x{height:<5} {cells:>8} {elapsed:>10.4f} {elapsed / cells * 1e6:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+"""Timed, seeded benchmarks for the maze, chunk generation, pulses, visibility, moving walls, pathfinding, rendering
+and the agent environments.
+
+Every benchmark is a setup function that builds its inputs from a parameter
+set and returns the callable to time, so setup cost never counts.
+"""
+import os
+import time
+import tracemalloc
+
+# Only the simulation is needed; rendering goes to off-screen surfaces
+os.environ.setdefault('COLOR_ECHO_MAZE_HEADLESS', '1')
+# Keep stdout clean for --output -
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+import pygame
+
+import main
+from env import ACTION_FIRST_PULSE, ACTION_WAIT, ACTIONS, BatchedMazeEnv, MazeEnv
+from main import ChunkedMaze, Maze, PulseSystem, PulseType, level_size
+
+# Off-screen render target size for the drawing benchmarks
+RENDER_SIZE = (1280, 720)
+
+
+def make_pulses(maze, count, radius, seed=0, spread=None):
+    """Return a PulseSystem of count pulses of the given radius around the middle of the maze, cycling colours"""
+    pulse_types = list(PulseType)
+    spread_x = min(spread or maze.width, maze.width - 2)
+    spread_y = min(spread or maze.height, maze.height - 2)
+    pulses = PulseSystem()
+    for index in range(count):
+        # Scatter the centres so pulses overlap partially
+        x = (maze.width - spread_x) // 2 + (index * 7 + seed) % spread_x
+        y = (maze.height - spread_y) // 2 + (index * 5 + seed) % spread_y
+        slot = pulses.emit(x, y, pulse_types[index % len(pulse_types)])
+        pulses.radius[slot] = radius
+    return pulses
+
+
+def bench_generate_maze(width, height, level, seed=0):
+    return lambda: Maze(width, height, level, seed=seed)
+
+
+def bench_generate_chunk(level, seed=0):
+    maze = ChunkedMaze(4096, 4096, level, seed=seed)
+    return lambda: maze.generate_chunk(3, 5)
+
+
+def bench_update_visibility(width, height, pulses, radius=300, seed=0):
+    maze = Maze(width, height, 5, seed=seed)
+    active = make_pulses(maze, pulses, radius, seed)
+    return lambda: maze.update_visibility(active)
+
+
+def bench_update_moving_walls(width, height, level, seed=0):
+    maze = Maze(width, height, level, seed=seed)
+    # Time the walls alone; distance_field_update covers keeping paths current
+    maze.distance_field = None
+    return maze.step_moving_walls
+
+
+def bench_distance_field(width, height, level, seed=0):
+    maze = Maze(width, height, level, seed=seed)
+    return maze.get_distance_field().recompute
+
+
+def bench_distance_field_update(width, height, level, walls=None, seed=0):
+    maze = Maze(width, height, level, seed=seed)
+    if walls is not None:
+        # Few enough moves for a repair to beat distance_field's full search
+        maze.moving_walls.keep(np.arange(len(maze.moving_walls)) < walls)
+    maze.get_distance_field()
+
+    def step():
+        maze.step_moving_walls()
+        maze.get_distance_field()
+    return step
+
+
+def bench_maze_draw(width, height, pulses, seed=0):
+    maze = Maze(width, height, 5, seed=seed)
+    # Keep the pulses within the area the camera shows
+    maze.update_visibility(make_pulses(maze, pulses, 400, seed, spread=16))
+    surface = pygame.Surface(RENDER_SIZE)
+    main.SCREEN_WIDTH, main.SCREEN_HEIGHT = RENDER_SIZE
+    # Look at the middle of the maze so the whole surface is covered where possible
+    camera_x = max(0, (width * main.GRID_SIZE - RENDER_SIZE[0]) // 2)
+    camera_y = max(0, (height * main.GRID_SIZE - RENDER_SIZE[1]) // 2)
+    return lambda: maze.draw(surface, camera_x, camera_y)
+
+
+def bench_pulse_draw(pulses, radius):
+    maze = Maze(40, 30, 1, seed=0)
+    active = make_pulses(maze, pulses, radius)
+    surface = pygame.Surface(RENDER_SIZE)
+    return lambda: active.draw(surface, 0, 0)
+
+
+def bench_pulse_update(pulses, seed=0):
+    maze = Maze(40, 30, 1, seed=seed)
+    active = make_pulses(maze, pulses, 0, seed)
+    # Staggered ages, so pulses keep expiring and new ones take their slots
+    active.age[:pulses] = [index * main.PULSE_DURATION / pulses for index in range(pulses)]
+    pulse_types = list(PulseType)
+    
+    def update():
+        expiring = len(active)
+        active.update(main.TICK)
+        for index in range(expiring - len(active)):
+            active.emit(1 + index % 38, 1 + index % 28, pulse_types[index % len(pulse_types)])
+    return update
+
+
+def bench_env_step(envs, batched, level=5, seed=0):
+    """Step envs mazes once each, through one BatchedMazeEnv or a loop over MazeEnvs"""
+    rng = np.random.default_rng(seed)
+    # Random waits and pulses, drawn up front so drawing them is never timed. Moving could
+    # step on a trap, and the new maze after it would swamp the timings
+    actions = rng.choice([ACTION_WAIT, *range(ACTION_FIRST_PULSE, len(ACTIONS))], (256, envs))
+    counter = iter(range(1 << 62))
+    
+    if batched:
+        env = BatchedMazeEnv(envs, level, seed=seed)
+        env.reset()
+        
+        def step():
+            _, _, done = env.step(actions[next(counter) % len(actions)])
+            if done.any():
+                env.reset(indices=np.flatnonzero(done))
+        return step
+    
+    singles = [MazeEnv(level) for _ in range(envs)]
+    for index, env in enumerate(singles):
+        env.reset(seed + index)
+    
+    def step():
+        row = actions[next(counter) % len(actions)].tolist()
+        for env, action in zip(singles, row):
+            if env.step(action)[2]:
+                env.reset()
+    return step
+
+
+# name -> (setup function, parameter sets for the full sweep, parameter sets for --quick)
+BENCHMARKS = {
+    'generate_maze': (
+        bench_generate_maze,
+        [dict(zip(('width', 'height'), level_size(level)), level=level) for level in (1, 5, 10, 20, 40)] +
+        [dict(width=size, height=size, level=5) for size in (100, 200, 400)],
+        [dict(zip(('width', 'height'), level_size(level)), level=level) for level in (1, 10)],
+    ),
+    'generate_chunk': (
+        bench_generate_chunk,
+        [dict(level=level) for level in (1, 5, 10)],
+        [dict(level=5)],
+    ),
+    'update_visibility': (
+        bench_update_visibility,
+        [dict(width=size, height=size, pulses=pulses) for size in (50, 200, 1000) for pulses in (1, 4, 16)],
+        [dict(width=50, height=50, pulses=pulses) for pulses in (1, 8)],
+    ),
+    'update_moving_walls': (
+        bench_update_moving_walls,
+        [dict(zip(('width', 'height'), level_size(level)), level=level) for level in (4, 10, 20, 40)] +
+        [dict(width=size, height=size, level=10) for size in (200, 400)],
+        [dict(zip(('width', 'height'), level_size(level)), level=level) for level in (4, 10)],
+    ),
+    'distance_field': (
+        bench_distance_field,
+        [dict(zip(('width', 'height'), level_size(level)), level=level) for level in (1, 10, 40)] +
+        [dict(width=size, height=size, level=10) for size in (200, 1000)],
+        [dict(zip(('width', 'height'), level_size(level)), level=level) for level in (1, 10)] +
+        [dict(width=200, height=200, level=10)],
+    ),
+    'distance_field_update': (
+        bench_distance_field_update,
+        [dict(zip(('width', 'height'), level_size(level)), level=level) for level in (4, 10, 20, 40)] +
+        [dict(width=size, height=size, level=10) for size in (200, 400)] +
+        [dict(width=size, height=size, level=10, walls=walls) for size in (200, 1000) for walls in (1, 4, 16)],
+        [dict(zip(('width', 'height'), level_size(level)), level=level) for level in (4, 10)] +
+        [dict(width=200, height=200, level=10, walls=4)],
+    ),
+    'maze_draw': (
+        bench_maze_draw,
+        [dict(width=size, height=size, pulses=pulses) for size in (40, 200, 1000) for pulses in (0, 8)],
+        [dict(width=40, height=40, pulses=8)],
+    ),
+    'pulse_draw': (
+        bench_pulse_draw,
+        [dict(pulses=pulses, radius=radius) for pulses in (1, 4, 16) for radius in (50, 200, 400)],
+        [dict(pulses=4, radius=200)],
+    ),
+    'pulse_update': (
+        bench_pulse_update,
+        [dict(pulses=pulses) for pulses in (1, 16, 256, 1024)],
+        [dict(pulses=256)],
+    ),
+    'env_step': (
+        bench_env_step,
+        [dict(envs=envs, batched=batched) for envs in (1, 16, 256) for batched in (False, True)],
+        [dict(envs=64, batched=batched) for batched in (False, True)],
+    ),
+}
+
+
+def measure(setup, params, repeats, min_time=0.05):
+    """Time one parameter set; returns best and mean seconds per call plus peak traced memory"""
+    run = setup(**params)
+    
+    # Pick a call count that makes each repeat long enough to time reliably
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            run()
+        if time.perf_counter() - start >= min_time or calls >= 1 << 16:
+            break
+        calls *= 2
+    
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(calls):
+            run()
+        timings.append((time.perf_counter() - start) / calls)
+    
+    # Memory is traced separately so tracing overhead never skews the timings,
+    # and only what one call allocates is counted
+    run = setup(**params)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    
+    return {
+        'seconds': min(timings),
+        'mean_seconds': sum(timings) / len(timings),
+        'calls': calls,
+        'peak_memory_kib': peak / 1024,
+    }
+
+
+def run_suite(names=None, quick=False, repeats=5, report=None):
+    """Run the selected benchmarks and return a list of result records"""
+    results = []
+    for name, (setup, full_params, quick_params) in BENCHMARKS.items():
+        if names and name not in names:
+            continue
+        for params in (quick_params if quick else full_params):
+            record = {'name': name, 'params': params}
+            record.update(measure(setup, params, repeats))
+            results.append(record)
+            if report:
+                report(record)
+    return results
+
+
+def result_key(record):
+    """Identify a result by benchmark name and parameters, for baseline comparison"""
+    return record['name'], tuple(sorted(record['params'].items()))
+
+
+def compare(results, baseline, tolerance):
+    """Return (record, baseline record, ratio) for every result slower than tolerance allows"""
+    previous = {result_key(record): record for record in baseline}
+    regressions = []
+    for record in results:
+        old = previous.get(result_key(record))
+        if old is None or old['seconds'] <= 0:
+            continue
+        ratio = record['seconds'] / old['seconds']
+        if ratio > 1 + tolerance:
+            regressions.append((record, old, ratio))
+    return regressions
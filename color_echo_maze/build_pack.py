@@ -0,0 +1,197 @@
+"""Build a level pack offline: ``python build_pack.py levels.pack --levels 1-50``.
+
+Mazes are generated in parallel across all cores from seeds derived from
+--seed, checked for a path from the start to the portal, and streamed into
+the pack in order as they finish. Metrics for every record go to a JSON
+lines file next to the pack. An interrupted build picks up where it stopped
+with --resume.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Only the maze is needed; see main.HEADLESS
+os.environ.setdefault('COLOR_ECHO_MAZE_HEADLESS', '1')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from level_pack import LevelPackWriter
+from main import CellType, Maze, level_size
+
+# Seeds tried per record before the build gives up
+MAX_ATTEMPTS = 5
+# Records queued per worker, enough to keep every core busy without holding many results
+QUEUE_PER_WORKER = 4
+
+
+def level_seed(base_seed, index, attempt):
+    """Return the 64-bit generation seed for one attempt at one record"""
+    digest = hashlib.blake2b(f"{base_seed}:{index}:{attempt}".encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+def level_metrics(maze, shortest_path):
+    """Return the difficulty metrics recorded for a maze"""
+    interior = (maze.width - 2) * (maze.height - 2)
+    walls = sum(maze.count_cells(cell_type) for cell_type in
+                (CellType.WALL, CellType.REFLECTIVE_WALL, CellType.ABSORBING_WALL, CellType.MOVING_WALL))
+    # The outer walls don't count towards density
+    walls -= 2 * (maze.width + maze.height) - 4
+    return {
+        'width': maze.width,
+        'height': maze.height,
+        'shortest_path': shortest_path,
+        'trap_density': round(maze.count_cells(CellType.TRAP) / interior, 4),
+        'wall_density': round(walls / interior, 4),
+        'moving_walls': len(maze.moving_walls),
+    }
+
+
+def build_level(index, level, base_seed):
+    """Generate and validate record index of the pack; returns its bytes and metrics"""
+    width, height = level_size(level)
+    for attempt in range(MAX_ATTEMPTS):
+        seed = level_seed(base_seed, index, attempt)
+        start = time.perf_counter()
+        try:
+            maze = Maze(width, height, level, seed)
+        except RuntimeError:
+            continue
+        elapsed = time.perf_counter() - start
+
+        shortest_path = maze.get_distance_field().distance(1, 1)
+        if shortest_path is None:
+            continue
+        metrics = {'index': index, 'level': level, 'seed': seed, 'attempt': attempt,
+                   'generation_ms': round(elapsed * 1e3, 3)}
+        metrics.update(level_metrics(maze, shortest_path))
+        return maze.to_bytes(), metrics
+
+    raise RuntimeError(f"No solvable maze for record {index} (level {level}) in {MAX_ATTEMPTS} attempts")
+
+
+def plan_jobs(first_level, last_level, per_level):
+    """Return the (index, level) of every record, in pack order"""
+    levels = [level for level in range(first_level, last_level + 1) for _ in range(per_level)]
+    return list(enumerate(levels))
+
+
+def resume_metrics(metrics_path, jobs, base_seed, records):
+    """Count the records already built, checking they match this build
+
+    Keeps at most records metrics lines, drops anything after them (such as a
+    half-written line), and returns how many were kept.
+    """
+    kept = 0
+    end = 0
+    with open(metrics_path, 'rb') as f:
+        for line in f:
+            if kept == records or not line.endswith(b'\n'):
+                break
+            metrics = json.loads(line)
+            index, level = jobs[kept] if kept < len(jobs) else (kept, None)
+            if (metrics['index'] != index or metrics['level'] != level or
+                    metrics['seed'] != level_seed(base_seed, index, metrics['attempt'])):
+                raise ValueError(f"Record {kept} in {metrics_path} was built with different options")
+            kept += 1
+            end += len(line)
+    os.truncate(metrics_path, end)
+    return kept
+
+
+def build_pack(path, jobs, base_seed=0, workers=None, metrics_path=None, resume=False, report=None):
+    """Build the records for jobs into the pack at path and return how many were built now"""
+    metrics_path = metrics_path or path + '.metrics.jsonl'
+    workers = workers or os.cpu_count() or 1
+    resume = resume and os.path.exists(metrics_path)
+
+    with LevelPackWriter(path, resume=resume) as writer, open(metrics_path, 'ab' if resume else 'wb') as metrics_file:
+        done = 0
+        if resume:
+            done = resume_metrics(metrics_path, jobs, base_seed, len(writer))
+            writer.truncate(done)
+
+        remaining = iter(jobs[done:])
+        built = 0
+        # Spawned for the reason given in MazePregenerator
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            # Results are written in submission order, so only a few are ever held at once
+            pending = deque()
+            while True:
+                while len(pending) < workers * QUEUE_PER_WORKER:
+                    job = next(remaining, None)
+                    if job is None:
+                        break
+                    pending.append(executor.submit(build_level, *job, base_seed))
+                if not pending:
+                    break
+
+                data, metrics = pending.popleft().result()
+                writer.add(data)
+                writer.flush()
+                metrics_file.write(json.dumps(metrics).encode() + b'\n')
+                metrics_file.flush()
+                built += 1
+                if report:
+                    report(done + built, len(jobs), built, metrics)
+    return built
+
+
+def parse_levels(text):
+    """Parse a level range such as '1-50', or a single level"""
+    first, _, last = text.partition('-')
+    first, last = int(first), int(last or first)
+    if not 1 <= first <= last:
+        raise argparse.ArgumentTypeError(f"invalid level range: {text}")
+    return first, last
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python build_pack.py',
+                                     description="Generate validated mazes in parallel into a level pack.")
+    parser.add_argument('output', help="level pack to write")
+    parser.add_argument('--levels', type=parse_levels, default=(1, 10),
+                        help="level or range of levels to build, e.g. 1-50 (default: 1-10)")
+    parser.add_argument('--per-level', type=int, default=1,
+                        help="mazes per level (default: 1; the game plays record K as level K + 1)")
+    parser.add_argument('--seed', type=int, default=0, help="base seed every maze's seed is derived from (default: 0)")
+    parser.add_argument('--workers', type=int, help="worker processes (default: one per core)")
+    parser.add_argument('--metrics', help="JSON lines file for per-level metrics (default: OUTPUT.metrics.jsonl)")
+    parser.add_argument('--resume', action='store_true', help="continue an interrupted build of the same pack")
+    args = parser.parse_args(argv)
+    if args.per_level < 1:
+        parser.error("--per-level must be at least 1")
+
+    jobs = plan_jobs(*args.levels, args.per_level)
+    start = time.perf_counter()
+
+    def report(count, total, built, metrics):
+        if count % 50 == 0 or count == total:
+            rate = built / max(time.perf_counter() - start, 1e-9)
+            print(f"{count}/{total} records (level {metrics['level']}, {rate:.1f}/s)", file=sys.stderr)
+
+    try:
+        built = build_pack(args.output, jobs, args.seed, args.workers, args.metrics, args.resume, report)
+    except ValueError as e:
+        print(f"Cannot resume: {e}", file=sys.stderr)
+        return 1
+    except RuntimeError as e:
+        # Raised by build_level; everything written before that record stays valid
+        print(f"Stopped: {e}; the records before it are kept for --resume", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print(f"Interrupted; run again with --resume to finish {args.output}", file=sys.stderr)
+        return 130
+
+    elapsed = time.perf_counter() - start
+    print(f"Built {built} records in {elapsed:.1f}s; {args.output} holds {len(jobs)}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
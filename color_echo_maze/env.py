@@ -0,0 +1,444 @@
+"""Programmatic environments for automated agents, with no window, fonts or sound.
+
+MazeEnv plays one maze with the game's own Maze, Player and PulseSystem:
+
+    env = MazeEnv(level=3)
+    observation = env.reset(seed=7)
+    done = False
+    while not done:
+        observation, reward, done = env.step(choose_action(observation))
+
+BatchedMazeEnv plays N independent mazes of one level in lockstep. Player
+positions, energy, pulses and views of every maze are stacked into arrays and
+updated with whole-batch NumPy operations. What must come from each maze's own
+random generators is still drawn maze by maze: the colour of an auto pulse
+falling due, and the new directions of blocked moving walls, whose walls are
+gathered from and handed back to each maze around the shared step. Those ticks
+run a Python loop over the mazes involved, so they grow with N. Given the same
+seeds and actions it plays out exactly like N MazeEnvs.
+
+Actions are integers: 0 waits, 1-4 move up, down, left and right, and 5-7
+emit a red, green or blue pulse. Each step applies one action and then runs
+ticks_per_step game ticks. Observations are dicts of arrays:
+
+    view       cells within VIEW_RADIUS of the player, indexed [x, y] with the
+               player in the middle; CellType values where a pulse currently
+               reveals the cell, UNSEEN elsewhere and outside the maze
+    position   the player's cell (x, y)
+    energy     red, green and blue pulse energy
+    time_left  seconds left before the level's time limit
+
+Reaching the portal earns REWARD_PORTAL, stepping on a trap REWARD_TRAP and
+running out of time REWARD_TIMEOUT; each of them ends the episode.
+"""
+import os
+
+# Keep agents' stdout clean
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import numpy as np
+
+from main import (AUTO_PULSE_INTERVAL, BASE_TIME_LIMIT, DIRECTION_STEPS, GRID_SIZE, IS_WALL, MOVING_WALL_INTERVAL,
+                  PULSE_DURATION, PULSE_MAX_RADIUS, PULSE_SPEED, PULSE_TYPES, REVEALED_BY, TICK, CellType,
+                  Direction, Maze, Player, PulseSystem, PulseType, disc_distances, level_size)
+
+# What each action does: wait, move in a Direction, or emit a pulse of a PulseType
+ACTIONS = (None, Direction.UP, Direction.DOWN, Direction.LEFT, Direction.RIGHT, *PULSE_TYPES)
+ACTION_WAIT = 0
+ACTION_FIRST_PULSE = 5
+STEP_TICKS = 6  # Game ticks per step, so agents act ten times per game second
+VIEW_RADIUS = 5  # Cells seen around the player in each direction
+VIEW_SIZE = 2 * VIEW_RADIUS + 1
+UNSEEN = -1  # View value of cells no pulse reveals
+
+REWARD_PORTAL = 1.0
+REWARD_TRAP = -1.0
+REWARD_TIMEOUT = -1.0
+
+# Pulse slots per maze in BatchedMazeEnv to start with; more are added as needed
+BATCH_PULSE_CAPACITY = 8
+# Pulses expire before growing past this many cells, so one table of distances covers them all
+PULSE_REACH = int(PULSE_MAX_RADIUS / GRID_SIZE)
+
+
+def reach_squares():
+    """Return the squared cell offsets within PULSE_REACH and the distances stencils use for them, both sorted"""
+    offsets = np.arange(-PULSE_REACH, PULSE_REACH + 1)
+    squares, first = np.unique((offsets[:, None] ** 2 + offsets ** 2).ravel(), return_index=True)
+    # The same distance values as disc_stencil's, so the views match the game's visibility exactly
+    return squares, disc_distances(PULSE_REACH)[0].ravel()[first]
+
+
+REACH_SQUARES, REACH_DISTANCES = reach_squares()
+# BatchedMazeEnv packs each column of a view into bits: bit j is the cell j rows from its top
+VIEW_BITS = (1 << np.arange(VIEW_SIZE)).astype(np.uint16)
+# Pulses further than this from the player along an axis reach nothing in view
+VIEW_REACH = VIEW_RADIUS + PULSE_REACH + 1
+
+
+def reach_columns():
+    """Return the view column masks pulses reach, indexed [pulse y - player y + VIEW_REACH, squared reach left + 1]
+
+    The squared reach left is a pulse's squared reach less the squared x offset
+    of the column from it; -1 stands for anything less than zero.
+    """
+    offsets = np.arange(-VIEW_REACH, VIEW_REACH + 1)
+    dy = np.arange(VIEW_SIZE) - VIEW_RADIUS - offsets[:, None]
+    left = np.arange(-1, REACH_SQUARES[-1] + 1)
+    reached = dy[:, None, :] ** 2 <= left[None, :, None]
+    return (reached * VIEW_BITS).sum(axis=2).astype(np.uint16)
+
+
+REACH_COLUMNS = reach_columns()
+# Bit t of REVEALED_BITS[value] is set if cells of that value are revealed by pulses of PulseType value t
+REVEALED_BITS = sum(REVEALED_BY[pulse_type].astype(np.uint8) << pulse_type.value for pulse_type in PULSE_TYPES)
+
+
+def level_time_limit(level):
+    """Seconds allowed on a level, as in GameManager.calculate_time_limit"""
+    return BASE_TIME_LIMIT + (level - 1) * 30
+
+
+class MazeEnv:
+    """One maze played through reset() and step()"""
+
+    def __init__(self, level=1, ticks_per_step=STEP_TICKS, maze_size=None):
+        self.level = level
+        self.ticks_per_step = ticks_per_step
+        self.width, self.height = maze_size or level_size(level)
+        self.time_limit = level_time_limit(level)
+        self.maze = None
+        self.player = None
+        self.pulses = PulseSystem()
+        self.elapsed_time = 0.0
+        self.done = True
+
+    def reset(self, seed=None):
+        """Start a new episode on a fresh maze and return the first observation"""
+        self.maze = Maze(self.width, self.height, self.level, seed)
+        self.player = Player(1, 1)
+        self.pulses.clear()
+        self.elapsed_time = 0.0
+        self.done = False
+        return self.observe()
+
+    def step(self, action):
+        """Apply an action and run ticks_per_step ticks; returns (observation, reward, done)"""
+        if self.done:
+            raise RuntimeError("The episode has ended; call reset() to start another")
+        command = ACTIONS[action]
+        if isinstance(command, Direction):
+            self.player.move(command, self.maze)
+        elif command is not None:
+            self.player.emit_pulse(command, self.pulses)
+
+        reward = 0.0
+        for _ in range(self.ticks_per_step):
+            reward = self.tick()
+            if self.done:
+                break
+        return self.observe(), reward, self.done
+
+    def tick(self):
+        """Advance the game by one tick the way GameManager.update does; returns the reward"""
+        self.elapsed_time += TICK
+        if self.elapsed_time >= self.time_limit:
+            self.done = True
+            return REWARD_TIMEOUT
+
+        self.player.regenerate_energy(TICK)
+        self.player.auto_emit_pulse(self.elapsed_time, self.maze, self.pulses)
+        self.pulses.update(TICK)
+        # Visibility only matters to observations, so it is worked out once per step in observe()
+        self.maze.update_moving_walls(TICK)
+
+        cell = self.maze.get_cell(self.player.x, self.player.y)
+        if cell == CellType.TRAP:
+            self.done = True
+            return REWARD_TRAP
+        if cell == CellType.PORTAL:
+            self.done = True
+            return REWARD_PORTAL
+        return 0.0
+
+    def observe(self):
+        self.maze.update_visibility(self.pulses)
+        # Nothing is drawn; see Maze.take_changed_areas
+        self.maze.take_changed_areas()
+
+        x, y = self.player.x, self.player.y
+        x0, y0 = max(0, x - VIEW_RADIUS), max(0, y - VIEW_RADIUS)
+        x1, y1 = min(self.width, x + VIEW_RADIUS + 1), min(self.height, y + VIEW_RADIUS + 1)
+        view = np.full((VIEW_SIZE, VIEW_SIZE), UNSEEN, dtype=np.int8)
+        view[x0 - x + VIEW_RADIUS:x1 - x + VIEW_RADIUS, y0 - y + VIEW_RADIUS:y1 - y + VIEW_RADIUS] = np.where(
+            self.maze.visible_mask(x0, y0, x1, y1), self.maze.cells[x0:x1, y0:y1], UNSEEN)
+        return {
+            'view': view,
+            'position': np.array([x, y], dtype=np.int32),
+            'energy': np.array([self.player.pulse_energy[pulse_type] for pulse_type in PULSE_TYPES], dtype=float),
+            'time_left': self.time_limit - self.elapsed_time,
+        }
+
+
+class BatchedMazeEnv:
+    """count independent mazes of one level, stepped together
+
+    Each maze is a full Maze whose cells are a row of one stacked grid, so
+    every lookup across mazes is one fancy index and the moving walls of all of
+    them step together. Mazes whose episode has ended ignore their actions
+    until they are reset; reset(indices=np.flatnonzero(done)) restarts just those.
+    """
+
+    def __init__(self, count, level=1, ticks_per_step=STEP_TICKS, maze_size=None, seed=None):
+        self.count = count
+        self.level = level
+        self.ticks_per_step = ticks_per_step
+        self.width, self.height = maze_size or level_size(level)
+        self.time_limit = level_time_limit(level)
+        # Seeds for mazes reset without one
+        self.seed_rng = np.random.default_rng(seed)
+
+        player = Player(1, 1)
+        self.start_energy = [player.pulse_energy[pulse_type] for pulse_type in PULSE_TYPES]
+        self.energy_regen_rate = player.energy_regen_rate
+        self.pulse_cost = player.pulse_cost
+
+        self.mazes = [None] * count
+        self.cells = np.zeros((count, self.width, self.height), dtype=np.uint8)
+        self.wall_neighbors = np.zeros_like(self.cells)
+        self.has_moving_walls = np.zeros(count, dtype=bool)
+        self.rows = np.arange(count)
+
+        # Player state and timers, one entry per maze
+        self.x = np.ones(count, dtype=np.int32)
+        self.y = np.ones(count, dtype=np.int32)
+        self.energy = np.zeros((count, len(PULSE_TYPES)))
+        self.last_auto_pulse_time = np.zeros(count)
+        self.elapsed_time = np.zeros(count)
+        self.wall_elapsed = np.zeros(count)
+        self.done = np.ones(count, dtype=bool)
+
+        # Pulses, one row of slots per maze
+        self.pulse_x = np.zeros((count, BATCH_PULSE_CAPACITY), dtype=np.int32)
+        self.pulse_y = np.zeros((count, BATCH_PULSE_CAPACITY), dtype=np.int32)
+        self.pulse_type = np.zeros((count, BATCH_PULSE_CAPACITY), dtype=np.int8)
+        self.pulse_age = np.zeros((count, BATCH_PULSE_CAPACITY))
+        self.pulse_radius = np.zeros((count, BATCH_PULSE_CAPACITY))
+        self.pulse_active = np.zeros((count, BATCH_PULSE_CAPACITY), dtype=bool)
+
+    def reset(self, seeds=None, indices=None):
+        """Start new episodes on fresh mazes and return the observations of every maze
+
+        indices selects the mazes to reset, by default all of them, and seeds
+        gives each of them a maze seed; mazes without one get the next seed
+        from the seed the environment was made with.
+        """
+        indices = self.rows if indices is None else np.atleast_1d(indices)
+        if seeds is None:
+            seeds = [None] * len(indices)
+        for index, seed in zip(indices.tolist(), seeds):
+            if seed is None:
+                seed = int(self.seed_rng.integers(1 << 63))
+            maze = Maze(self.width, self.height, self.level, seed)
+            # The maze's grids become rows of the stacked ones, so its walls move in place
+            self.cells[index] = maze.cells
+            self.wall_neighbors[index] = maze.wall_neighbors
+            maze.cells = self.cells[index]
+            maze.wall_neighbors = self.wall_neighbors[index]
+            self.mazes[index] = maze
+            self.has_moving_walls[index] = len(maze.moving_walls) > 0
+
+        self.x[indices] = 1
+        self.y[indices] = 1
+        self.energy[indices] = self.start_energy
+        self.last_auto_pulse_time[indices] = 0.0
+        self.elapsed_time[indices] = 0.0
+        self.wall_elapsed[indices] = 0.0
+        self.pulse_active[indices] = False
+        self.done[indices] = False
+        return self.observe()
+
+    def step(self, actions):
+        """Apply one action per maze and run ticks_per_step ticks; returns (observations, rewards, done) arrays"""
+        actions = np.asarray(actions)
+        live = ~self.done
+        rewards = np.zeros(self.count)
+
+        # Moves, blocked by the maze's edge and walls as in Player.move
+        moving = live & (actions >= 1) & (actions < ACTION_FIRST_PULSE)
+        steps = DIRECTION_STEPS[np.clip(actions - 1, 0, len(DIRECTION_STEPS) - 1)]
+        new_x = self.x + steps[:, 0]
+        new_y = self.y + steps[:, 1]
+        inside = (new_x >= 0) & (new_x < self.width) & (new_y >= 0) & (new_y < self.height)
+        blocked = IS_WALL[self.cells[self.rows, np.clip(new_x, 0, self.width - 1), np.clip(new_y, 0, self.height - 1)]]
+        moved = moving & inside & ~blocked
+        self.x[moved] = new_x[moved]
+        self.y[moved] = new_y[moved]
+
+        # Pulses, where there is the energy for them
+        pulse_types = np.clip(actions - ACTION_FIRST_PULSE, 0, len(PULSE_TYPES) - 1)
+        pulsing = live & (actions >= ACTION_FIRST_PULSE)
+        pulsing &= self.energy[self.rows, pulse_types] >= self.pulse_cost
+        self.emit(np.flatnonzero(pulsing), pulse_types[pulsing])
+
+        for _ in range(self.ticks_per_step):
+            if self.done.all():
+                break
+            self.tick(rewards)
+        return self.observe(), rewards, self.done.copy()
+
+    def tick(self, rewards):
+        """Advance every maze still being played by one tick, adding any end-of-episode rewards to rewards"""
+        live = ~self.done
+        self.elapsed_time[live] += TICK
+        expired = live & (self.elapsed_time >= self.time_limit)
+        rewards[expired] = REWARD_TIMEOUT
+        self.done |= expired
+        live &= ~expired
+
+        # Capped as in Player.regenerate_energy
+        self.energy[live] = np.minimum(100, self.energy[live] + self.energy_regen_rate * TICK)
+
+        # Auto pulses fall due for a few mazes at a time; each picks its colour with
+        # its own maze's generator, exactly as Player.auto_emit_pulse does
+        due = np.flatnonzero(live & (self.elapsed_time - self.last_auto_pulse_time >= AUTO_PULSE_INTERVAL))
+        emitters = []
+        emitted_types = []
+        for index in due.tolist():
+            pulse_types = list(PulseType)
+            self.mazes[index].rng.shuffle(pulse_types)
+            for pulse_type in pulse_types:
+                if self.energy[index, pulse_type.value] >= self.pulse_cost:
+                    emitters.append(index)
+                    emitted_types.append(pulse_type.value)
+                    break
+        emitters = np.array(emitters, dtype=np.int64)
+        self.last_auto_pulse_time[emitters] = self.elapsed_time[emitters]
+        self.emit(emitters, np.array(emitted_types, dtype=np.int64))
+
+        self.pulse_radius[live] += PULSE_SPEED * TICK
+        self.pulse_age[live] += TICK
+        self.pulse_active &= (self.pulse_age <= PULSE_DURATION) & (self.pulse_radius <= PULSE_MAX_RADIUS)
+
+        # The step timers of every maze advance together; only mazes with moving walls step them
+        self.wall_elapsed[live] += TICK
+        wall_steps = (self.wall_elapsed // MOVING_WALL_INTERVAL).astype(np.int64)
+        self.wall_elapsed -= wall_steps * MOVING_WALL_INTERVAL
+        for step in range(wall_steps.max()):
+            stepping = np.flatnonzero((wall_steps > step) & self.has_moving_walls)
+            if stepping.size:
+                self.step_moving_walls(stepping)
+
+        cells = self.cells[self.rows, self.x, self.y]
+        trapped = live & (cells == CellType.TRAP.value)
+        escaped = live & (cells == CellType.PORTAL.value)
+        rewards[trapped] = REWARD_TRAP
+        rewards[escaped] = REWARD_PORTAL
+        self.done |= trapped | escaped
+
+    def step_moving_walls(self, indices):
+        """Move the moving walls of the mazes in indices one step, as Maze.step_moving_walls does for each
+
+        The walls of all the mazes are planned and moved together. Blocked walls
+        turn with draws from their own maze's generator, so every maze moves
+        exactly as it would on its own.
+        """
+        walls = [self.mazes[index].moving_walls for index in indices.tolist()]
+        counts = np.array([len(moving_walls) for moving_walls in walls])
+        owners = np.repeat(indices, counts)
+        x = np.concatenate([moving_walls.x for moving_walls in walls])
+        y = np.concatenate([moving_walls.y for moving_walls in walls])
+        direction = np.concatenate([moving_walls.direction for moving_walls in walls])
+
+        # Plan the step as MovingWalls.plan_step does, with each target keyed by its maze as well
+        target_x = x + DIRECTION_STEPS[direction, 0]
+        target_y = y + DIRECTION_STEPS[direction, 1]
+        inside = (target_x >= 1) & (target_x < self.width - 1) & (target_y >= 1) & (target_y < self.height - 1)
+        free = inside
+        free[inside] = self.cells[owners[inside], target_x[inside], target_y[inside]] == CellType.EMPTY.value
+        candidates = np.flatnonzero(free)
+        keys = (owners[candidates] * self.width + target_x[candidates]) * self.height + target_y[candidates]
+        _, first = np.unique(keys, return_index=True)
+        movers = np.sort(candidates[first])
+
+        blocked = np.ones(len(x), dtype=bool)
+        blocked[movers] = False
+        turns = np.bincount(np.repeat(np.arange(len(walls)), counts)[blocked], minlength=len(walls))
+        direction[blocked] = np.concatenate([
+            self.mazes[index].np_rng.integers(0, len(DIRECTION_STEPS), count)
+            for index, count in zip(indices.tolist(), turns.tolist())])
+
+        moved = owners[movers]
+        old_x, old_y = x[movers], y[movers]
+        new_x, new_y = target_x[movers], target_y[movers]
+        x[movers] = new_x
+        y[movers] = new_y
+        self.cells[moved, old_x, old_y] = CellType.EMPTY.value
+        self.cells[moved, new_x, new_y] = CellType.MOVING_WALL.value
+        for dx, dy in DIRECTION_STEPS:
+            np.subtract.at(self.wall_neighbors, (moved, old_x + dx, old_y + dy), 1)
+            np.add.at(self.wall_neighbors, (moved, new_x + dx, new_y + dy), 1)
+
+        # Hand each maze back its share of the walls
+        ends = np.cumsum(counts).tolist()
+        for moving_walls, start, end in zip(walls, [0] + ends[:-1], ends):
+            moving_walls.x, moving_walls.y, moving_walls.direction = x[start:end], y[start:end], direction[start:end]
+
+    def emit(self, indices, pulse_types):
+        """Spend energy on and start a pulse of each PulseType value at the player of each maze in indices"""
+        if not indices.size:
+            return
+        self.energy[indices, pulse_types] -= self.pulse_cost
+        if self.pulse_active[indices].all(axis=1).any():
+            self.grow_pulses()
+        # The first free slot of each row
+        slots = np.argmin(self.pulse_active[indices], axis=1)
+        self.pulse_x[indices, slots] = self.x[indices]
+        self.pulse_y[indices, slots] = self.y[indices]
+        self.pulse_type[indices, slots] = pulse_types
+        self.pulse_age[indices, slots] = 0.0
+        self.pulse_radius[indices, slots] = 0.0
+        self.pulse_active[indices, slots] = True
+
+    def grow_pulses(self):
+        """Double the pulse slots of every maze"""
+        for name in ('pulse_x', 'pulse_y', 'pulse_type', 'pulse_age', 'pulse_radius', 'pulse_active'):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros_like(array)], axis=1))
+
+    def observe(self):
+        offsets = np.arange(-VIEW_RADIUS, VIEW_RADIUS + 1)
+        xs = self.x[:, None] + offsets
+        ys = self.y[:, None] + offsets
+        inside = ((xs >= 0) & (xs < self.width))[:, :, None] & ((ys >= 0) & (ys < self.height))[:, None, :]
+        # One flat gather from the stacked grids
+        columns = (self.rows * self.width)[:, None] + np.clip(xs, 0, self.width - 1)
+        rows = np.clip(ys, 0, self.height - 1)
+        values = self.cells.ravel().take(columns[:, :, None] * self.height + rows[:, None, :])
+
+        # Only active pulses are looked at, in maze order: pulse k belongs to maze owners[k]
+        owners, slots = np.nonzero(self.pulse_active)
+        visible_columns = np.zeros((self.count, VIEW_SIZE), dtype=np.uint16)
+        if owners.size:
+            # A pulse reaches the cells whose squared offset is at most that of its stencil's furthest cell
+            steps = np.searchsorted(REACH_DISTANCES, self.pulse_radius[owners, slots] / GRID_SIZE, side='right')
+            furthest = REACH_SQUARES[steps - 1]
+            dx = xs[owners] - self.pulse_x[owners, slots][:, None]
+            dy = np.clip(self.pulse_y[owners, slots] - self.y[owners], -VIEW_REACH, VIEW_REACH)
+            left = np.clip(furthest[:, None] - dx ** 2, -1, None)
+            reached = REACH_COLUMNS[dy[:, None] + VIEW_REACH, left + 1]
+
+            # The view's cells each colour reveals, as column masks indexed [maze, PulseType value, x]
+            colours = np.arange(len(PULSE_TYPES), dtype=np.uint8)[:, None, None]
+            revealed = ((REVEALED_BITS[values][:, None] >> colours) & 1) @ VIEW_BITS
+            reached &= revealed[owners, self.pulse_type[owners, slots]]
+            # OR together the columns of each maze's pulses
+            firsts = np.flatnonzero(np.diff(owners, prepend=-1))
+            visible_columns[owners[firsts]] = np.bitwise_or.reduceat(reached, firsts, axis=0)
+        visible = ((visible_columns[:, :, None] & VIEW_BITS) != 0) & inside
+        return {
+            'view': np.where(visible, values, UNSEEN).astype(np.int8),
+            'position': np.stack([self.x, self.y], axis=1),
+            'energy': self.energy.copy(),
+            'time_left': self.time_limit - self.elapsed_time,
+        }
@@ -0,0 +1,210 @@
+"""Lightweight per-phase frame timing and on-demand profiling for the game loop.
+
+GameManager wraps each phase of a frame in ``timer.phase(name)``. While the
+timer is disabled that returns a shared no-op context manager, so the
+instrumentation costs next to nothing until it is switched on.
+
+FrameProfiler captures a cProfile of a fixed number of loop iterations when
+asked, then writes it out on a background thread.
+"""
+import cProfile
+import csv
+import io
+import json
+import os
+import pstats
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+# Returned by FrameTimer.phase while timing is disabled
+NULL_PHASE = nullcontext()
+
+PERCENTILES = (50, 95, 99)
+
+
+class Phase:
+    """Context manager adding its elapsed time to one phase of the current frame"""
+    __slots__ = ('timer', 'name', 'start')
+    
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.name = name
+        self.start = 0.0
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        current = self.timer.current
+        current[self.name] = current.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(percent / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+
+class FrameTimer:
+    """Records how long each named phase of every frame takes
+    
+    Keeps a rolling window of recent frames for percentiles, and a longer
+    bounded history of whole frames for export.
+    """
+    
+    def __init__(self, enabled=False, window=600, history=36000):
+        self.enabled = enabled
+        self.window = window
+        # Phase name -> durations of the last `window` frames it appeared in
+        self.recent = {}
+        # Phase names in the order they were first seen, for stable columns
+        self.phase_names = []
+        # (frame number, {phase: seconds}) for the last `history` frames
+        self.frames = deque(maxlen=history)
+        self.frame_number = 0
+        self.current = {}
+        self.frame_start = time.perf_counter()
+    
+    def phase(self, name):
+        """Return a context manager timing one phase of the current frame"""
+        if not self.enabled:
+            return NULL_PHASE
+        return Phase(self, name)
+    
+    def end_frame(self):
+        """Close the current frame, recording its total time and phase times"""
+        now = time.perf_counter()
+        if self.enabled:
+            self.current['frame'] = now - self.frame_start
+            for name, seconds in self.current.items():
+                if name not in self.recent:
+                    self.recent[name] = deque(maxlen=self.window)
+                    self.phase_names.append(name)
+                self.recent[name].append(seconds)
+            self.frames.append((self.frame_number, self.current))
+            self.current = {}
+        self.frame_number += 1
+        self.frame_start = now
+    
+    def summary(self):
+        """Return {phase: {'p50': ms, 'p95': ms, 'p99': ms, 'mean': ms}} over the rolling window"""
+        stats = {}
+        for name in self.phase_names:
+            values = sorted(self.recent[name])
+            entry = {f"p{percent}": percentile(values, percent) * 1000 for percent in PERCENTILES}
+            entry['mean'] = sum(values) / len(values) * 1000
+            stats[name] = entry
+        return stats
+    
+    def export(self, path):
+        """Write the recorded frames to path, as JSON if it ends in .json and CSV otherwise"""
+        if path.endswith('.json'):
+            document = {
+                'summary_ms': self.summary(),
+                'frames_ms': [
+                    dict(frame_number=number, **{name: seconds * 1000 for name, seconds in phases.items()})
+                    for number, phases in self.frames
+                ],
+            }
+            with open(path, 'w') as f:
+                json.dump(document, f, indent=2)
+            return
+        
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(['frame_number'] + [f"{name}_ms" for name in self.phase_names])
+            for number, phases in self.frames:
+                writer.writerow([number] + [f"{phases[name] * 1000:.4f}" if name in phases else ''
+                                            for name in self.phase_names])
+
+
+class FrameProfiler:
+    """Runs cProfile over the next few game-loop iterations when requested
+    
+    Call request() to arm it, begin_frame() at the top of each iteration and
+    end_frame() at the bottom. Once the requested number of frames has been
+    captured the stats are written to a timestamped .prof file and summarized
+    on stdout from a background thread, so the game loop keeps running.
+    """
+    
+    def __init__(self, frames=120, directory='.'):
+        self.frames = frames
+        self.directory = directory
+        self.profile = None
+        self.pending = False
+        self.remaining = 0
+        self.writers = []
+    
+    @property
+    def active(self):
+        return self.profile is not None
+    
+    def request(self):
+        """Profile the next `frames` iterations, unless a capture is already running"""
+        if not self.active:
+            self.pending = True
+    
+    def begin_frame(self):
+        if self.pending:
+            self.pending = False
+            self.remaining = self.frames
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+    
+    def end_frame(self):
+        if not self.active:
+            return
+        self.remaining -= 1
+        if self.remaining <= 0:
+            self.stop()
+    
+    def stop(self):
+        """End the capture early or on schedule and hand it to a writer thread"""
+        if not self.active:
+            return
+        profile = self.profile
+        profile.disable()
+        captured = self.frames - self.remaining
+        self.profile = None
+        
+        path = self.reserve_path()
+        writer = threading.Thread(target=self.write, args=(profile, path, captured),
+                                  name="FrameProfilerWriter")
+        writer.start()
+        self.writers = [thread for thread in self.writers if thread.is_alive()] + [writer]
+    
+    def reserve_path(self):
+        """Create and return an empty, not yet used profile file named after the current time"""
+        stamp = time.strftime("profile-%Y%m%d-%H%M%S")
+        number = 0
+        while True:
+            name = f"{stamp}.prof" if number == 0 else f"{stamp}-{number}.prof"
+            path = os.path.join(self.directory, name)
+            try:
+                # Claimed here rather than by the writer, so captures in the same second never share a file
+                open(path, 'x').close()
+                return path
+            except FileExistsError:
+                number += 1
+    
+    @staticmethod
+    def write(profile, path, frames):
+        """Dump the stats to path and print the 20 most expensive functions"""
+        profile.dump_stats(path)
+        summary = io.StringIO()
+        stats = pstats.Stats(profile, stream=summary)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(20)
+        print(f"Profiled {frames} frames to {path}\n{summary.getvalue()}", flush=True)
+    
+    def close(self):
+        """Finish any running capture and wait for pending writes"""
+        self.stop()
+        for writer in self.writers:
+            writer.join()
+        self.writers = []
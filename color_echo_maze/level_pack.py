@@ -0,0 +1,150 @@
+"""Level packs: many serialized mazes in one file, read through mmap.
+
+Layout, little endian:
+
+    header   magic b'CEMP', u16 version, u16 reserved, u32 count, u64 index offset
+    records  one per maze: u32 length, then that many bytes (Maze.to_bytes())
+    index    count x (u64 offset of the record's data, u32 length)
+
+The index is written when the writer is closed. A pack whose writer never
+finished has an index offset of 0, and is read by walking the records instead.
+Either way only the requested record's bytes are touched when a level loads.
+"""
+import mmap
+import os
+import struct
+
+PACK_MAGIC = b'CEMP'
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct('<4sHHIQ')
+RECORD_HEADER = struct.Struct('<I')
+INDEX_ENTRY = struct.Struct('<QI')
+
+
+class LevelPackWriter:
+    """Streams records into a level pack
+
+    With resume=True an existing pack, finished or not, is reopened and new
+    records are added after its last complete one.
+    """
+
+    def __init__(self, path, resume=False):
+        self.entries = []
+        if resume and os.path.exists(path) and os.path.getsize(path) >= PACK_HEADER.size:
+            with LevelPack(path) as pack:
+                self.entries = pack.get_entries()
+            self.file = open(path, 'r+b')
+            # Until closed again the pack reads as unfinished, so it stays usable after a crash
+            self.file.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, 0, 0))
+            self.truncate(len(self.entries))
+        else:
+            self.file = open(path, 'wb')
+            self.file.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, 0, 0))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def add(self, data):
+        """Append one record, such as Maze.to_bytes(), and return its index"""
+        self.file.write(RECORD_HEADER.pack(len(data)))
+        self.entries.append((self.file.tell(), len(data)))
+        self.file.write(data)
+        return len(self.entries) - 1
+
+    def flush(self):
+        """Push written records to the operating system, e.g. so a crash loses none of them"""
+        self.file.flush()
+
+    def truncate(self, count):
+        """Drop every record after the first count"""
+        self.entries = self.entries[:count]
+        end = self.entries[-1][0] + self.entries[-1][1] if self.entries else PACK_HEADER.size
+        self.file.truncate(end)
+        self.file.seek(end)
+
+    def close(self):
+        """Write the index and finish the header"""
+        if self.file.closed:
+            return
+        index_offset = self.file.tell()
+        for offset, length in self.entries:
+            self.file.write(INDEX_ENTRY.pack(offset, length))
+        self.file.seek(0)
+        self.file.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, 0, len(self.entries), index_offset))
+        self.file.close()
+
+
+class LevelPack:
+    """A level pack opened read-only; pack[k] is a memoryview of record k"""
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as file:
+            self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if len(self.map) < PACK_HEADER.size:
+            self.map.close()
+            raise ValueError(f"{path} is too short to be a level pack")
+        magic, version, _, count, index_offset = PACK_HEADER.unpack_from(self.map)
+        if magic != PACK_MAGIC:
+            self.map.close()
+            raise ValueError(f"{path} is not a level pack")
+        if version != PACK_VERSION:
+            self.map.close()
+            raise ValueError(f"{path} is level pack version {version}, expected {PACK_VERSION}")
+
+        if index_offset:
+            self.count = count
+            self.index_offset = index_offset
+            self.entries = None
+        else:
+            # Unfinished pack: find the records from their length prefixes
+            self.entries = self.scan()
+            self.count = len(self.entries)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, k):
+        if not 0 <= k < self.count:
+            raise IndexError(f"level pack has {self.count} records, not {k + 1}")
+        if self.entries is not None:
+            offset, length = self.entries[k]
+        else:
+            offset, length = INDEX_ENTRY.unpack_from(self.map, self.index_offset + k * INDEX_ENTRY.size)
+        return memoryview(self.map)[offset:offset + length]
+
+    def get_entries(self):
+        """Return (offset, length) of every record"""
+        if self.entries is not None:
+            return list(self.entries)
+        return [INDEX_ENTRY.unpack_from(self.map, self.index_offset + k * INDEX_ENTRY.size)
+                for k in range(self.count)]
+
+    def scan(self):
+        """Return (offset, length) of every complete record, stopping at a truncated one"""
+        entries = []
+        position = PACK_HEADER.size
+        while position + RECORD_HEADER.size <= len(self.map):
+            (length,) = RECORD_HEADER.unpack_from(self.map, position)
+            position += RECORD_HEADER.size
+            if position + length > len(self.map):
+                break
+            entries.append((position, length))
+            position += length
+        return entries
+
+    def close(self):
+        self.map.close()
@@ -3,22 +3,110 @@ import sys
 import time
 import os
 import random
+import hashlib
+import multiprocessing
+import struct
+import zlib
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
-from collections import deque  # Add deque for BFS pathfinding
+from collections import OrderedDict, deque  # Add deque for BFS pathfinding
+from bisect import bisect_right
+from functools import lru_cache
+from assets import AssetLoader
+from audio import AudioManager
+from instrumentation import FrameProfiler, FrameTimer
+from level_pack import LevelPack
+from pathfinding import DistanceField
+from replay import ReplayRecorder
 
-# Initialize pygame
-pygame.init()
-pygame.font.init()
-pygame.mixer.init()  # Initialize the sound mixer
+# Headless mode runs the simulation without a window, fonts or sound, e.g. on CI machines.
+# Enable it with COLOR_ECHO_MAZE_HEADLESS=1 or by running main.py with --headless
+HEADLESS = (os.environ.get('COLOR_ECHO_MAZE_HEADLESS', '0') not in ('', '0') or
+            (__name__ == "__main__" and '--headless' in sys.argv[1:]))
+
+def init_pygame(headless=HEADLESS):
+    """Start the pygame subsystems the game needs; importing this module starts none of them"""
+    if headless:
+        # Nothing is initialized, but make sure SDL never reaches for real devices
+        os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+        os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+        return
+    
+    # Initialize pygame
+    pygame.init()
+    pygame.font.init()
+    try:
+        pygame.mixer.init()  # Initialize the sound mixer
+    except pygame.error as e:
+        print(f"Warning: Could not start the sound mixer. Error: {e}")
 
 # Game constants
 SCREEN_WIDTH = 800  # Default width, will be overridden in fullscreen
 SCREEN_HEIGHT = 600  # Default height, will be overridden in fullscreen
 GRID_SIZE = 40
 FPS = 60
+TICK_RATE = 60  # Game logic updates per second, independent of the display frame rate
+TICK = 1 / TICK_RATE
+MAX_TICKS_PER_FRAME = 5  # Updates allowed to catch up after a slow frame before time is dropped
 FULLSCREEN = True  # Set to True to run in fullscreen mode
 AUTO_PULSE_INTERVAL = 4.0  # Time between automatic pulses in seconds
 BASE_TIME_LIMIT = 200  # Base time limit in seconds for level 1
+MAX_GENERATION_ATTEMPTS = 10  # Fresh layouts to try before maze generation gives up
+MOVING_WALL_INTERVAL = 1.0  # Seconds of game time between moving-wall steps
+PREGENERATE_MAZES = True  # Build the next and restart mazes in a worker process during play
+CHUNKED_MAZE_CELLS = 512 * 512  # Larger mazes are generated chunk by chunk as they are explored
+CHUNK_SIZE = 32  # Cells along each side of a chunk
+CHUNK_MEMORY_BUDGET = 4 * 1024 * 1024  # Bytes of live chunks kept before the least recently used are evicted
+
+# Per-phase frame timing: F3 toggles the overlay, and setting this path (or passing
+# --frame-stats PATH) times every frame and writes the data there on exit (.json or .csv)
+FRAME_STATS_PATH = os.environ.get('COLOR_ECHO_MAZE_FRAME_STATS') or None
+if __name__ == "__main__" and '--frame-stats' in sys.argv[1:-1]:
+    FRAME_STATS_PATH = sys.argv[sys.argv.index('--frame-stats') + 1]
+
+# Level pack to play from (see level_pack.py): level K is the pack's record K - 1, and
+# levels past the end of the pack are generated as usual. Also set with --level-pack PATH
+LEVEL_PACK_PATH = os.environ.get('COLOR_ECHO_MAZE_LEVEL_PACK') or None
+if __name__ == "__main__" and '--level-pack' in sys.argv[1:-1]:
+    LEVEL_PACK_PATH = sys.argv[sys.argv.index('--level-pack') + 1]
+
+# Play every level on a maze of this size instead of the level's own, e.g. 4000x4000 for a
+# huge chunked maze. Also set with --maze-size WIDTHxHEIGHT
+MAZE_SIZE = os.environ.get('COLOR_ECHO_MAZE_SIZE') or None
+if __name__ == "__main__" and '--maze-size' in sys.argv[1:-1]:
+    MAZE_SIZE = sys.argv[sys.argv.index('--maze-size') + 1]
+if MAZE_SIZE:
+    MAZE_SIZE = tuple(int(size) for size in MAZE_SIZE.lower().split('x'))
+
+# Seed every maze of a game is derived from, so a seeded game with the same key presses plays
+# out the same way. Also set with --seed N; each game picks a random one when unset
+SEED = os.environ.get('COLOR_ECHO_MAZE_SEED') or None
+if __name__ == "__main__" and '--seed' in sys.argv[1:-1]:
+    SEED = sys.argv[sys.argv.index('--seed') + 1]
+SEED = int(SEED) if SEED else None
+
+# Record the game's seed and key presses here for play_replay.py. Also set with --record PATH
+RECORD_PATH = os.environ.get('COLOR_ECHO_MAZE_RECORD') or None
+if __name__ == "__main__" and '--record' in sys.argv[1:-1]:
+    RECORD_PATH = sys.argv[sys.argv.index('--record') + 1]
+# Ticks between the state hashes written to a recording, to check replays against
+REPLAY_HASH_INTERVAL = TICK_RATE
+
+# Fullscreen draws the game at this fraction of the desktop resolution, or at a fixed
+# WIDTHxHEIGHT, and upscales each frame to fill the screen. Also set with --render-scale
+RENDER_SCALE = os.environ.get('COLOR_ECHO_MAZE_RENDER_SCALE') or None
+if __name__ == "__main__" and '--render-scale' in sys.argv[1:-1]:
+    RENDER_SCALE = sys.argv[sys.argv.index('--render-scale') + 1]
+if RENDER_SCALE and 'x' in RENDER_SCALE.lower():
+    RENDER_SCALE = tuple(int(size) for size in RENDER_SCALE.lower().split('x'))
+else:
+    RENDER_SCALE = float(RENDER_SCALE) if RENDER_SCALE else 1.0
+# Render scales F8 cycles through during play
+RENDER_SCALES = (1.0, 0.75, 0.5)
+
+# F9 profiles this many game-loop iterations with cProfile into a timestamped .prof file
+PROFILE_FRAMES = 120
 
 # Get the current directory of the script
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -30,6 +118,25 @@ SOUND_GREEN_PULSE = os.path.join(SOUNDS_DIR, 'green_pulse.wav')
 SOUND_BLUE_PULSE = os.path.join(SOUNDS_DIR, 'blue_pulse.wav')
 SOUND_GAME_OVER = os.path.join(SOUNDS_DIR, 'game_over.wav')
 SOUND_LEVEL_COMPLETE = os.path.join(SOUNDS_DIR, 'level_complete.wav')
+SOUND_FILES = {
+    'move': SOUND_MOVE,
+    'red_pulse': SOUND_RED_PULSE,
+    'green_pulse': SOUND_GREEN_PULSE,
+    'blue_pulse': SOUND_BLUE_PULSE,
+    'game_over': SOUND_GAME_OVER,
+    'level_complete': SOUND_LEVEL_COMPLETE,
+}
+# Mixer channels reserved for each category of sound
+SOUND_CHANNELS = {'movement': 2, 'pulse': 4, 'event': 2}
+# Category of each sound, and how many copies of it may play at once
+SOUND_SETTINGS = {
+    'move': ('movement', 2),
+    'red_pulse': ('pulse', 2),
+    'green_pulse': ('pulse', 2),
+    'blue_pulse': ('pulse', 2),
+    'game_over': ('event', 1),
+    'level_complete': ('event', 1),
+}
 
 # Colors
 BLACK = (0, 0, 0)
@@ -42,6 +149,27 @@ GRAY = (100, 100, 100)
 
 # Pulse duration in seconds
 PULSE_DURATION = 3.0
+PULSE_SPEED = 200  # Pixels per second a pulse ring grows
+PULSE_MAX_RADIUS = 400  # Pixels; a pulse ends early once its ring is this large
+PULSE_CAPACITY = 64  # Pulse slots allocated up front; more are added as needed
+
+class MonotonicClock:
+    """Clock driving the game loop in real time; it never jumps back when the system time changes"""
+    
+    def time(self):
+        return time.perf_counter()
+
+class SimulatedClock:
+    """Clock that only moves when advanced, so simulations can outrun real time"""
+    
+    def __init__(self, start=0.0):
+        self.now = start
+    
+    def time(self):
+        return self.now
+    
+    def advance(self, dt):
+        self.now += dt
 
 class CellType(Enum):
     EMPTY = 0
@@ -53,81 +181,260 @@ class CellType(Enum):
     ABSORBING_WALL = 6
     MOVING_WALL = 7
 
+# Cell types that block movement and pulses
+WALL_TYPES = frozenset([CellType.WALL, CellType.REFLECTIVE_WALL, CellType.ABSORBING_WALL, CellType.MOVING_WALL])
+
 class Direction(Enum):
     UP = (0, -1)
     DOWN = (0, 1)
     LEFT = (-1, 0)
     RIGHT = (1, 0)
 
+# Cell offsets of each direction, indexed by position in Direction
+DIRECTION_STEPS = np.array([direction.value for direction in Direction], dtype=np.int32)
+
 class PulseType(Enum):
     RED = 0
     GREEN = 1
     BLUE = 2
 
-class Pulse:
-    def __init__(self, x, y, pulse_type, maze):
-        self.x = x
-        self.y = y
-        self.type = pulse_type
-        self.start_time = time.time()
-        self.radius = 0
-        self.max_radius = 400
-        self.speed = 200  # pixels per second
-        self.active = True
-        self.maze = maze
-        
-        # Set color based on pulse type
-        if self.type == PulseType.RED:
-            self.color = RED
-        elif self.type == PulseType.GREEN:
-            self.color = GREEN
-        else:  # BLUE
-            self.color = BLUE
+# Pulse types and ring colours indexed by PulseType value
+PULSE_TYPES = tuple(sorted(PulseType, key=lambda pulse_type: pulse_type.value))
+PULSE_COLORS = (RED, GREEN, BLUE)
+
+# Cell types indexed by the value stored in Maze.cells
+CELL_TYPES = tuple(sorted(CellType, key=lambda cell_type: cell_type.value))
+
+def cell_mask(cell_types):
+    """Build a lookup table mapping stored cell values to membership of cell_types"""
+    return np.array([cell_type in cell_types for cell_type in CELL_TYPES])
+
+IS_WALL = cell_mask(WALL_TYPES)
+# Cells a path to the portal may cross
+WALKABLE = cell_mask([CellType.EMPTY, CellType.SAFE_PATH, CellType.PORTAL])
+# Cells revealed by each pulse colour; every pulse reveals walls
+REVEALED_BY = {
+    PulseType.RED: cell_mask(WALL_TYPES | {CellType.TRAP}),
+    PulseType.GREEN: cell_mask(WALL_TYPES | {CellType.SAFE_PATH}),
+    PulseType.BLUE: cell_mask(WALL_TYPES | {CellType.PORTAL}),
+}
+
+@lru_cache(maxsize=None)
+def disc_distances(radius):
+    """Distances from the centre cell of a (2 * radius + 1) square, plus their sorted distinct values"""
+    # Computed exactly like the old per-cell check so stencils match it bit for bit
+    offsets = range(-radius, radius + 1)
+    distances = np.array([[(dx ** 2 + dy ** 2) ** 0.5 for dy in offsets] for dx in offsets])
+    return distances, sorted(set(distances.ravel().tolist()))
+
+@lru_cache(maxsize=None)
+def disc_mask(radius, steps):
+    """Mask of the cells whose distance is among the first `steps` distinct distances"""
+    distances, values = disc_distances(radius)
+    mask = distances <= values[steps - 1]
+    mask.flags.writeable = False
+    return mask
+
+def disc_stencil(max_distance):
+    """Return the cached mask of cells within max_distance of the centre of the square"""
+    radius = int(max_distance)
+    _, values = disc_distances(radius)
+    # Every distance between two neighbouring values gives the same mask
+    return disc_mask(radius, bisect_right(values, max_distance))
+
+# Fill colours of revealed cells
+CELL_COLORS = {
+    CellType.WALL: WHITE,
+    CellType.TRAP: RED,
+    CellType.SAFE_PATH: GREEN,
+    CellType.PORTAL: BLUE,
+    CellType.REFLECTIVE_WALL: (200, 200, 200),
+    CellType.ABSORBING_WALL: (50, 50, 50),
+    CellType.MOVING_WALL: (150, 100, 200),
+}
+
+# One GRID_SIZE tile per cell value, left to right, built on first use
+tile_atlas = None
+
+def get_tile_atlas():
+    """Return the surface holding a filled tile for every revealed cell type"""
+    global tile_atlas
+    if tile_atlas is None:
+        tile_atlas = pygame.Surface((len(CELL_TYPES) * GRID_SIZE, GRID_SIZE))
+        for cell_type, color in CELL_COLORS.items():
+            tile_atlas.fill(color, (cell_type.value * GRID_SIZE, 0, GRID_SIZE, GRID_SIZE))
+    return tile_atlas
+
+# Pre-rendered grid lines, built on first draw for the current screen size
+grid_layer = None
+
+def get_grid_layer():
+    """Return the grid-line layer for the current screen size, rendering it if needed
+    
+    Every cell outline is the same, so one screen-sized layer plus a cell of
+    slack covers any camera position when shifted by the offset within a cell.
+    """
+    global grid_layer
+    size = (SCREEN_WIDTH + GRID_SIZE, SCREEN_HEIGHT + GRID_SIZE)
+    if grid_layer is None or grid_layer.get_size() != size:
+        grid_layer = pygame.Surface(size)
+        for screen_x in range(0, size[0], GRID_SIZE):
+            for screen_y in range(0, size[1], GRID_SIZE):
+                pygame.draw.rect(grid_layer, GRAY, (screen_x, screen_y, GRID_SIZE, GRID_SIZE), 1)
+    return grid_layer
+
+class PulseSystem:
+    """Every pulse in play, stored as parallel arrays indexed by slot
+    
+    A pulse's slot goes on a free list when it expires and is handed to the
+    next pulse emitted, so pulses cost no allocations once the arrays are big
+    enough, and every tick updates all of them in one vectorized pass.
+    """
+    # Per-pixel alpha scratch surface shared by all pulses, sized to the largest ring drawn
+    overlay = None
+    
+    def __init__(self, capacity=PULSE_CAPACITY):
+        self.x = np.zeros(capacity, dtype=np.int32)
+        self.y = np.zeros(capacity, dtype=np.int32)
+        # PulseType values
+        self.type = np.zeros(capacity, dtype=np.int8)
+        self.age = np.zeros(capacity)
+        self.radius = np.zeros(capacity)
+        # State after the previous tick, for drawing between ticks
+        self.previous_age = np.zeros(capacity)
+        self.previous_radius = np.zeros(capacity)
+        self.active = np.zeros(capacity, dtype=bool)
+        # Emission order, so rings are drawn oldest first whichever slots they are in
+        self.serial = np.zeros(capacity, dtype=np.int64)
+        self.next_serial = 0
+        # Free slots, the lowest last so it is used first
+        self.free = list(range(capacity - 1, -1, -1))
+        # Active slots in emission order, oldest first
+        self.order = deque()
+    
+    def __len__(self):
+        return len(self.x) - len(self.free)
+    
+    def grow(self):
+        """Double the number of slots"""
+        capacity = len(self.x)
+        for name in ('x', 'y', 'type', 'age', 'radius', 'previous_age', 'previous_radius', 'active', 'serial'):
+            array = getattr(self, name)
+            setattr(self, name, np.concatenate([array, np.zeros_like(array)]))
+        self.free.extend(range(2 * capacity - 1, capacity - 1, -1))
+    
+    def emit(self, x, y, pulse_type):
+        """Start a pulse at cell (x, y) and return its slot"""
+        if not self.free:
+            self.grow()
+        slot = self.free.pop()
+        self.x[slot] = x
+        self.y[slot] = y
+        self.type[slot] = pulse_type.value
+        self.age[slot] = self.radius[slot] = 0.0
+        self.previous_age[slot] = self.previous_radius[slot] = 0.0
+        self.active[slot] = True
+        self.serial[slot] = self.next_serial
+        self.next_serial += 1
+        self.order.append(slot)
+        return slot
+    
+    def clear(self):
+        self.active[:] = False
+        self.free = list(range(len(self.x) - 1, -1, -1))
+        self.order.clear()
     
     def update(self, dt):
-        # Expand the pulse
-        self.radius += self.speed * dt
-        
-        # Check if pulse duration has expired
-        if time.time() - self.start_time > PULSE_DURATION or self.radius > self.max_radius:
-            self.active = False
+        """Expand every pulse by dt seconds and free the slots of those that expired"""
+        if not self.order:
+            # Free slots are reset when they are next used
+            return
+        # Free slots are updated too; that is cheaper than selecting the active ones
+        self.previous_age[:] = self.age
+        self.previous_radius[:] = self.radius
+        self.radius += PULSE_SPEED * dt
+        self.age += dt
+        
+        # Every pulse has grown by the same steps since it started, so none is
+        # older or wider than one emitted before it and they expire in order
+        order, age, radius = self.order, self.age, self.radius
+        expired = []
+        while order and (age[order[0]] > PULSE_DURATION or radius[order[0]] > PULSE_MAX_RADIUS):
+            expired.append(order.popleft())
+        if expired:
+            self.active[expired] = False
+            self.free.extend(sorted(expired, reverse=True))
     
-    def draw(self, screen, camera_offset_x, camera_offset_y):
-        if not self.active:
+    def active_slots(self):
+        """Return the slots of the active pulses, oldest first"""
+        return np.array(self.order, dtype=np.int64)
+    
+    def update_hash(self, hasher):
+        """Feed the active pulses into a hashlib hasher"""
+        slots = self.active_slots()
+        for array in (self.x, self.y, self.type, self.age, self.radius):
+            hasher.update(array[slots].tobytes())
+    
+    def live(self, before=None):
+        """Return (x, y, PulseType, radius) for every active pulse, oldest first
+        
+        With before, pulses emitted with that serial or a later one are left out.
+        """
+        slots = self.active_slots()
+        if before is not None:
+            slots = slots[self.serial[slots] < before]
+        return zip(self.x[slots].tolist(), self.y[slots].tolist(),
+                   [PULSE_TYPES[value] for value in self.type[slots].tolist()], self.radius[slots].tolist())
+    
+    def get_radii(self, slots, alpha=1.0):
+        """Return the radii of slots a fraction alpha of the way from the previous tick to this one"""
+        previous = self.previous_radius[slots]
+        return previous + (self.radius[slots] - previous) * alpha
+    
+    def get_rects(self, camera_offset_x, camera_offset_y, alpha=1.0, slots=None):
+        """Return the screen rects covered by the rings of slots, by default every active pulse"""
+        if slots is None:
+            slots = self.active_slots()
+        reach = self.get_radii(slots, alpha).astype(np.int64) + 2
+        left = self.x[slots] * GRID_SIZE - camera_offset_x - reach
+        top = self.y[slots] * GRID_SIZE - camera_offset_y - reach
+        size = reach * 2 + 1
+        return [pygame.Rect(x, y, side, side) for x, y, side in zip(left.tolist(), top.tolist(), size.tolist())]
+    
+    def draw(self, screen, camera_offset_x, camera_offset_y, alpha=1.0):
+        """Draw every active pulse ring, oldest first"""
+        slots = self.active_slots()
+        if not slots.size:
             return
+        rects = self.get_rects(camera_offset_x, camera_offset_y, alpha, slots)
+        radii = self.get_radii(slots, alpha).tolist()
+        previous_age = self.previous_age[slots]
+        ages = (previous_age + (self.age[slots] - previous_age) * alpha).tolist()
+        clip = screen.get_clip()
+        
+        for rect, radius, age, value in zip(rects, radii, ages, self.type[slots].tolist()):
+            # Only the part of the ring inside the screen's clip area is drawn
+            visible = rect.clip(clip)
+            if not visible:
+                continue
             
-        # Calculate transparency based on time left
-        time_left = PULSE_DURATION - (time.time() - self.start_time)
-        alpha = max(0, min(255, int(255 * (time_left / PULSE_DURATION))))
-        
-        # Create a surface for the pulse
-        pulse_surface = pygame.Surface((SCREEN_WIDTH * 2, SCREEN_HEIGHT * 2), pygame.SRCALPHA)
-        
-        # Draw the pulse circle with transparency
-        try:
-            pygame.draw.circle(
-                pulse_surface, 
-                (*self.color, alpha), 
-                (SCREEN_WIDTH, SCREEN_HEIGHT), 
-                self.radius, 
-                5
-            )
-        except ValueError:
-            # Fallback if there's still an issue with the color
-            pygame.draw.circle(
-                pulse_surface, 
-                (*self.color, 128), 
-                (SCREEN_WIDTH, SCREEN_HEIGHT), 
-                self.radius, 
-                5
-            )
-        
-        # Draw the pulse on the screen
-        screen.blit(
-            pulse_surface, 
-            (-SCREEN_WIDTH + self.x * GRID_SIZE - camera_offset_x, 
-             -SCREEN_HEIGHT + self.y * GRID_SIZE - camera_offset_y)
-        )
+            # Calculate transparency based on time left
+            time_left = PULSE_DURATION - age
+            opacity = max(0, min(255, int(255 * (time_left / PULSE_DURATION))))
+            
+            # Reuse the shared overlay, growing it only when a ring outgrows it
+            if PulseSystem.overlay is None or PulseSystem.overlay.get_width() < rect.width:
+                PulseSystem.overlay = pygame.Surface((rect.width, rect.height), pygame.SRCALPHA)
+            
+            # Clear and draw just the visible part of the ring's bounding box
+            area = visible.move(-rect.x, -rect.y)
+            PulseSystem.overlay.set_clip(area)
+            PulseSystem.overlay.fill((0, 0, 0, 0), area)
+            center = (rect.width // 2, rect.height // 2)
+            pygame.draw.circle(PulseSystem.overlay, (*PULSE_COLORS[value], opacity), center, radius, 5)
+            
+            # Draw the pulse on the screen
+            screen.blit(PulseSystem.overlay, visible.topleft, area)
 
 class Player:
     def __init__(self, x, y):
@@ -140,7 +447,7 @@ class Player:
         }
         self.energy_regen_rate = 5  # Energy points per second
         self.pulse_cost = 20  # Energy cost per pulse
-        self.last_auto_pulse_time = time.time()  # Track time of last auto pulse
+        self.last_auto_pulse_time = 0.0  # Level time of the last auto pulse
     
     def move(self, direction, maze):
         new_x = self.x + direction.value[0]
@@ -151,7 +458,7 @@ class Player:
             cell = maze.get_cell(new_x, new_y)
             
             # Can't move through walls
-            if cell == CellType.WALL or cell == CellType.REFLECTIVE_WALL or cell == CellType.ABSORBING_WALL or cell == CellType.MOVING_WALL:
+            if cell in WALL_TYPES:
                 return False
                 
             self.x = new_x
@@ -159,32 +466,36 @@ class Player:
             return True
         return False
     
-    def emit_pulse(self, pulse_type, maze):
+    def emit_pulse(self, pulse_type, pulses):
+        """Emit a pulse into the PulseSystem if there is enough energy; returns whether one was emitted"""
         # Check if player has enough energy
         if self.pulse_energy[pulse_type] >= self.pulse_cost:
             self.pulse_energy[pulse_type] -= self.pulse_cost
-            return Pulse(self.x, self.y, pulse_type, maze)
-        return None
+            pulses.emit(self.x, self.y, pulse_type)
+            return True
+        return False
     
     def regenerate_energy(self, dt):
-        for pulse_type in self.pulse_energy:
-            self.pulse_energy[pulse_type] = min(100, self.pulse_energy[pulse_type] + self.energy_regen_rate * dt)
+        for pulse_type, energy in self.pulse_energy.items():
+            # Full energy is always exactly 100, which min() would leave as it is
+            if energy != 100:
+                self.pulse_energy[pulse_type] = min(100, energy + self.energy_regen_rate * dt)
     
-    def auto_emit_pulse(self, current_time, maze):
+    def auto_emit_pulse(self, current_time, maze, pulses):
+        """Emit a pulse of a random affordable type into pulses when one is due; returns its type or None"""
         # Check if it's time for an auto pulse (every AUTO_PULSE_INTERVAL seconds)
         if current_time - self.last_auto_pulse_time >= AUTO_PULSE_INTERVAL:
-            # Randomly select a pulse type
+            # Randomly select a pulse type, from the maze's generator so seeded runs repeat exactly
             pulse_types = list(PulseType)
-            random.shuffle(pulse_types)
+            maze.rng.shuffle(pulse_types)
             
             # Try each pulse type until one succeeds
             for pulse_type in pulse_types:
-                pulse = self.emit_pulse(pulse_type, maze)
-                if pulse:
+                if self.emit_pulse(pulse_type, pulses):
                     self.last_auto_pulse_time = current_time
-                    return pulse, pulse_type
+                    return pulse_type
                     
-        return None, None
+        return None
     
     def draw(self, screen, camera_offset_x, camera_offset_y):
         # Draw player as a yellow circle
@@ -196,126 +507,407 @@ class Player:
             GRID_SIZE // 2 - 5
         )
 
+class MovingWalls:
+    """Positions and headings of a maze's moving walls, stored as parallel arrays
+    
+    All walls step together every `interval` seconds of game time. The store
+    only plans moves; Maze applies them to the grid.
+    """
+    
+    def __init__(self, interval=MOVING_WALL_INTERVAL):
+        self.x = np.zeros(0, dtype=np.int32)
+        self.y = np.zeros(0, dtype=np.int32)
+        # Index into DIRECTION_STEPS
+        self.direction = np.zeros(0, dtype=np.int8)
+        self.interval = interval
+        self.elapsed = 0.0
+    
+    def __len__(self):
+        return len(self.x)
+    
+    def extend(self, xs, ys, directions):
+        """Add walls from parallel sequences of positions and Directions, all at once"""
+        self.x = np.concatenate((self.x, np.asarray(xs, dtype=np.int32)))
+        self.y = np.concatenate((self.y, np.asarray(ys, dtype=np.int32)))
+        headings = [list(Direction).index(direction) for direction in directions]
+        self.direction = np.concatenate((self.direction, np.asarray(headings, dtype=np.int8)))
+    
+    def keep(self, mask):
+        """Keep only the walls selected by a boolean mask"""
+        self.x = self.x[mask]
+        self.y = self.y[mask]
+        self.direction = self.direction[mask]
+    
+    def prune(self, cells):
+        """Drop walls whose cell was overwritten, and all but the latest wall added on any cell"""
+        count = len(self)
+        on_cell = cells[self.x, self.y] == CellType.MOVING_WALL.value
+        # The first match in the reversed positions is the last wall added there
+        _, last = np.unique((self.x * cells.shape[1] + self.y)[::-1], return_index=True)
+        latest = np.zeros(count, dtype=bool)
+        latest[count - 1 - last] = True
+        self.keep(on_cell & latest)
+    
+    def steps_due(self, dt):
+        """Advance the step timer by dt seconds and return how many steps are due"""
+        self.elapsed += dt
+        steps = int(self.elapsed // self.interval)
+        self.elapsed -= steps * self.interval
+        return steps
+    
+    def plan_step(self, cells, np_rng):
+        """Work out one step against the grid as it stands
+        
+        A wall moves if the cell ahead is empty, inside the outer walls, and not
+        claimed by an earlier wall in the store; every other wall turns to a
+        random direction instead. Returns the indices of the walls that move and
+        their new positions.
+        """
+        width, height = cells.shape
+        target_x = self.x + DIRECTION_STEPS[self.direction, 0]
+        target_y = self.y + DIRECTION_STEPS[self.direction, 1]
+        
+        inside = (target_x >= 1) & (target_x < width - 1) & (target_y >= 1) & (target_y < height - 1)
+        free = inside
+        free[inside] = cells[target_x[inside], target_y[inside]] == CellType.EMPTY.value
+        candidates = np.flatnonzero(free)
+        _, first = np.unique(target_x[candidates] * height + target_y[candidates], return_index=True)
+        movers = np.sort(candidates[first])
+        
+        # Blocked walls turn
+        blocked = np.ones(len(self), dtype=bool)
+        blocked[movers] = False
+        self.direction[blocked] = np_rng.integers(0, len(DIRECTION_STEPS), np.count_nonzero(blocked))
+        return movers, target_x[movers], target_y[movers]
+    
+    def move(self, movers, new_x, new_y):
+        self.x[movers] = new_x
+        self.y[movers] = new_y
+
+# Serialized maze: header, width * height cell bytes, moving wall x (int32), y (int32) and
+# direction (int8) arrays, then a CRC-32 of everything before it. Little endian throughout
+MAZE_MAGIC = b'CEMZ'
+MAZE_FORMAT_VERSION = 1
+# magic, version, flags, width, height, level, seed, portal x, portal y, moving wall count
+MAZE_HEADER = struct.Struct('<4sHHIIIQiiI')
+MAZE_CHECKSUM = struct.Struct('<I')
+MAZE_HAS_SEED = 1
+
+def cheapest_route(cells, start, goal, x0, y0, x1, y1):
+    """Return the route from start to goal inside the cell box (x0, y0)-(x1, y1) that crosses the fewest blocked cells
+    
+    Runs a 0-1 BFS where walkable cells cost nothing and walls or traps cost
+    one. The route is listed from goal back to start, or is None if goal
+    can't be reached.
+    """
+    cost = {start: 0}
+    came_from = {start: None}
+    queue = deque([start])
+    
+    while queue:
+        x, y = queue.popleft()
+        if (x, y) == goal:
+            break
+        
+        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+            nx, ny = x + dx, y + dy
+            if not (x0 <= nx < x1 and y0 <= ny < y1):
+                continue
+            
+            step = 0 if WALKABLE[cells[nx, ny]] else 1
+            new_cost = cost[(x, y)] + step
+            if (nx, ny) not in cost or new_cost < cost[(nx, ny)]:
+                cost[(nx, ny)] = new_cost
+                came_from[(nx, ny)] = (x, y)
+                # Free steps go to the front so cells are expanded in cost order
+                if step == 0:
+                    queue.appendleft((nx, ny))
+                else:
+                    queue.append((nx, ny))
+    
+    if goal not in came_from:
+        return None
+    
+    route = []
+    cell = goal
+    while cell is not None:
+        route.append(cell)
+        cell = came_from[cell]
+    return route
+
+def render_resolution(native_size, render_scale):
+    """Resolution to draw at on a display of native_size: render_scale's own (width, height), or a fraction of native"""
+    if isinstance(render_scale, tuple):
+        return render_scale
+    return max(1, round(native_size[0] * render_scale)), max(1, round(native_size[1] * render_scale))
+
+def level_size(level):
+    """Maze dimensions for a level"""
+    return 20 + level * 2, 15 + level * 2
+
 class Maze:
-    def __init__(self, width, height, level):
+    def __init__(self, width, height, level, seed=None, generate=True):
         self.width = width
         self.height = height
         self.level = level
-        self.grid = [[CellType.EMPTY for _ in range(height)] for _ in range(width)]
-        self.visible_grid = [[False for _ in range(height)] for _ in range(width)]
-        self.moving_walls = []
+        # Every random choice goes through this generator so a seed reproduces the maze
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # Vectorized placement draws from a NumPy generator seeded from the same stream
+        self.np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        # One bit per cell, packed along y: column x holds cells (x, 0) to (x, height - 1)
+        self.visible_bits = np.zeros((width, (height + 7) // 8), dtype=np.uint8)
+        self.previous_visible_bits = np.zeros_like(self.visible_bits)
+        # Cell boxes (x0, y0, x1, y1) that look different since take_changed_areas was last called
+        self.changed_areas = []
+        # (PulseSystem, serial) set by defer_visibility until something reads the visibility
+        self.deferred_pulses = None
+        self.reset_grid()
+        if generate:
+            self.generate_maze()
+    
+    def to_bytes(self):
+        """Serialize the maze layout in the versioned binary format (see MAZE_HEADER)
+        
+        Seeds that don't fit in 64 unsigned bits are left out.
+        """
+        walls = self.moving_walls
+        has_seed = isinstance(self.seed, int) and 0 <= self.seed < 2 ** 64
+        portal_x, portal_y = self.portal_position or (-1, -1)
+        data = b''.join([
+            MAZE_HEADER.pack(MAZE_MAGIC, MAZE_FORMAT_VERSION, MAZE_HAS_SEED if has_seed else 0,
+                             self.width, self.height, self.level, self.seed if has_seed else 0,
+                             portal_x, portal_y, len(walls)),
+            self.cells.tobytes(),
+            walls.x.astype('<i4').tobytes(),
+            walls.y.astype('<i4').tobytes(),
+            walls.direction.tobytes(),
+        ])
+        return data + MAZE_CHECKSUM.pack(zlib.crc32(data))
+    
+    @classmethod
+    def from_bytes(cls, data):
+        """Load a maze written by to_bytes() from any bytes-like object, without generating it"""
+        data = memoryview(data)
+        if len(data) < MAZE_HEADER.size + MAZE_CHECKSUM.size:
+            raise ValueError("Maze data is truncated")
+        (magic, version, flags, width, height, level, seed,
+         portal_x, portal_y, wall_count) = MAZE_HEADER.unpack_from(data)
+        if magic != MAZE_MAGIC:
+            raise ValueError("Not a serialized maze")
+        if version != MAZE_FORMAT_VERSION:
+            raise ValueError(f"Maze format version {version} is not supported (expected {MAZE_FORMAT_VERSION})")
+        
+        cells_end = MAZE_HEADER.size + width * height
+        walls_end = cells_end + wall_count * 9
+        if len(data) != walls_end + MAZE_CHECKSUM.size:
+            raise ValueError("Maze data is truncated or has trailing bytes")
+        (checksum,) = MAZE_CHECKSUM.unpack_from(data, walls_end)
+        if zlib.crc32(data[:walls_end]) != checksum:
+            raise ValueError("Maze data failed its checksum")
+        
+        maze = cls(width, height, level, seed if flags & MAZE_HAS_SEED else None, generate=False)
+        maze.cells = np.frombuffer(data[MAZE_HEADER.size:cells_end], dtype=np.uint8).reshape(width, height).copy()
+        maze.count_wall_neighbors()
+        maze.portal_position = (portal_x, portal_y) if portal_x >= 0 else None
+        walls = np.frombuffer(data[cells_end:walls_end], dtype=np.uint8)
+        maze.moving_walls.x = walls[:wall_count * 4].view('<i4').astype(np.int32)
+        maze.moving_walls.y = walls[wall_count * 4:wall_count * 8].view('<i4').astype(np.int32)
+        maze.moving_walls.direction = walls[wall_count * 8:].view(np.int8).copy()
+        return maze
+    
+    def get_state(self):
+        """Return the serialized maze plus its random generators' states, to send between processes"""
+        return self.to_bytes(), self.rng.getstate(), self.np_rng.bit_generator.state
+    
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild a maze from get_state() so it plays on exactly as the original would"""
+        data, rng_state, np_rng_state = state
+        maze = cls.from_bytes(data)
+        maze.rng.setstate(rng_state)
+        maze.np_rng.bit_generator.state = np_rng_state
+        return maze
+    
+    def reset_grid(self):
+        """Clear the maze back to empty cells"""
+        # Cell types are stored as their enum values, indexed [x, y]
+        self.cells = np.zeros((self.width, self.height), dtype=np.uint8)
+        # Number of wall cells among each cell's four neighbours, kept in sync by set_cell
+        self.wall_neighbors = np.zeros((self.width, self.height), dtype=np.uint8)
+        self.moving_walls = MovingWalls()
         self.portal_position = None
-        self.generate_maze()
+        # Distances to the portal, built on demand. The cells moving walls leave
+        # and enter are kept until the next query repairs the distances for them,
+        # or None once so many moved that searching again is cheaper
+        self.distance_field = None
+        self.moved_cells = []
+        self.moved_count = 0
+    
+    def set_cell(self, x, y, cell_type):
+        """Set a cell and update the wall counts of its neighbours"""
+        self.distance_field = None
+        was_wall = IS_WALL[self.cells[x, y]]
+        is_wall = cell_type in WALL_TYPES
+        self.cells[x, y] = cell_type.value
+        
+        if was_wall != is_wall:
+            for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < self.width and 0 <= ny < self.height:
+                    if is_wall:
+                        self.wall_neighbors[nx, ny] += 1
+                    else:
+                        self.wall_neighbors[nx, ny] -= 1
+    
+    def count_wall_neighbors(self):
+        """Recount the wall neighbours of every cell after a bulk grid change"""
+        walls = IS_WALL[self.cells].astype(np.uint8)
+        counts = np.zeros_like(walls)
+        counts[1:, :] += walls[:-1, :]
+        counts[:-1, :] += walls[1:, :]
+        counts[:, 1:] += walls[:, :-1]
+        counts[:, :-1] += walls[:, 1:]
+        self.wall_neighbors = counts
+    
+    def count_cells(self, cell_type):
+        """Return how many cells in the maze have the given type"""
+        return int(np.count_nonzero(self.cells == cell_type.value))
     
     def generate_maze(self):
+        """Generate layouts until one has a path to the portal, repairing where possible"""
+        for _ in range(MAX_GENERATION_ATTEMPTS):
+            self.place_cells()
+            # Later placements may have covered some moving walls
+            self.moving_walls.prune(self.cells)
+            
+            # Knock out the walls along the cheapest route rather than starting over
+            if self.has_path_to_portal() or self.repair_path_to_portal():
+                # Play rarely asks for paths, so don't track wall moves until it does
+                self.distance_field = None
+                return
+            
+            self.reset_grid()
+        
+        raise RuntimeError(f"Could not generate a solvable {self.width}x{self.height} maze "
+                           f"in {MAX_GENERATION_ATTEMPTS} attempts")
+    
+    def place_cells(self):
         # This is a simple maze generation for demonstration
         # In a real game, you'd want a more sophisticated algorithm
         
         # Add outer walls
-        for x in range(self.width):
-            self.grid[x][0] = CellType.WALL
-            self.grid[x][self.height - 1] = CellType.WALL
-        
-        for y in range(self.height):
-            self.grid[0][y] = CellType.WALL
-            self.grid[self.width - 1][y] = CellType.WALL
-        
-        # Add some random walls
+        self.cells[:, 0] = CellType.WALL.value
+        self.cells[:, -1] = CellType.WALL.value
+        self.cells[0, :] = CellType.WALL.value
+        self.cells[-1, :] = CellType.WALL.value
+        self.count_wall_neighbors()
+        
+        # Add some random walls. Each wall changes what the next one may block,
+        # so these are placed one at a time
         wall_count = (self.width * self.height) // 5
+        # Moving walls are collected here and stored together after the loop
+        moving_x, moving_y, moving_directions = [], [], []
         for _ in range(wall_count):
-            x = random.randint(1, self.width - 2)
-            y = random.randint(1, self.height - 2)
+            x = self.rng.randint(1, self.width - 2)
+            y = self.rng.randint(1, self.height - 2)
             
             # Skip if this would block the player completely
             if self.would_block_player(x, y):
                 continue
                 
             # Add different wall types based on level
-            if self.level >= 3 and random.random() < 0.2:
-                self.grid[x][y] = CellType.REFLECTIVE_WALL
-            elif self.level >= 2 and random.random() < 0.2:
-                self.grid[x][y] = CellType.ABSORBING_WALL
-            elif self.level >= 4 and random.random() < 0.1:
-                self.grid[x][y] = CellType.MOVING_WALL
-                self.moving_walls.append((x, y, random.choice(list(Direction))))
+            if self.level >= 3 and self.rng.random() < 0.2:
+                self.set_cell(x, y, CellType.REFLECTIVE_WALL)
+            elif self.level >= 2 and self.rng.random() < 0.2:
+                self.set_cell(x, y, CellType.ABSORBING_WALL)
+            elif self.level >= 4 and self.rng.random() < 0.1:
+                self.set_cell(x, y, CellType.MOVING_WALL)
+                moving_x.append(x)
+                moving_y.append(y)
+                moving_directions.append(self.rng.choice(list(Direction)))
             else:
-                self.grid[x][y] = CellType.WALL
+                self.set_cell(x, y, CellType.WALL)
+        self.moving_walls.extend(moving_x, moving_y, moving_directions)
         
-        # Add traps
+        # Add traps. Traps don't change the wall counts, so every candidate is
+        # checked against the grid as it stands before any trap is placed
         trap_count = (self.width * self.height) // 10
-        for _ in range(trap_count):
-            x = random.randint(1, self.width - 2)
-            y = random.randint(1, self.height - 2)
-            if self.grid[x][y] == CellType.EMPTY and not self.would_block_player(x, y):
-                self.grid[x][y] = CellType.TRAP
+        xs, ys = self.random_interior_cells(trap_count)
+        allowed = (self.cells[xs, ys] == CellType.EMPTY.value) & ~self.blocking_mask()[xs, ys]
+        self.cells[xs[allowed], ys[allowed]] = CellType.TRAP.value
         
         # Add safe paths
         safe_path_count = (self.width * self.height) // 8
-        for _ in range(safe_path_count):
-            x = random.randint(1, self.width - 2)
-            y = random.randint(1, self.height - 2)
-            if self.grid[x][y] == CellType.EMPTY:
-                self.grid[x][y] = CellType.SAFE_PATH
+        xs, ys = self.random_interior_cells(safe_path_count)
+        empty = self.cells[xs, ys] == CellType.EMPTY.value
+        self.cells[xs[empty], ys[empty]] = CellType.SAFE_PATH.value
         
         # Add portal
         while True:
-            x = random.randint(self.width // 2, self.width - 2)
-            y = random.randint(1, self.height - 2)
-            if self.grid[x][y] == CellType.EMPTY:
-                self.grid[x][y] = CellType.PORTAL
+            x = self.rng.randint(self.width // 2, self.width - 2)
+            y = self.rng.randint(1, self.height - 2)
+            if self.cells[x, y] == CellType.EMPTY.value:
+                self.set_cell(x, y, CellType.PORTAL)
                 self.portal_position = (x, y)
                 break
         
         # Make sure the starting area is clear
         for x in range(1, 3):
             for y in range(1, 3):
-                self.grid[x][y] = CellType.EMPTY
+                self.set_cell(x, y, CellType.EMPTY)
+    
+    def random_interior_cells(self, count):
+        """Draw count random interior coordinates as a pair of index arrays"""
+        xs = self.np_rng.integers(1, self.width - 1, size=count)
+        ys = self.np_rng.integers(1, self.height - 1, size=count)
+        return xs, ys
+    
+    def blocking_mask(self):
+        """Return a boolean grid of cells where would_block_player is True for an empty cell"""
+        # Empty interior cells that a single extra wall would enclose
+        at_risk = (self.cells == CellType.EMPTY.value) & (self.wall_neighbors == 3)
+        at_risk[0, :] = at_risk[-1, :] = False
+        at_risk[:, 0] = at_risk[:, -1] = False
+        
+        # Any neighbour of an at-risk cell is blocked
+        blocked = np.zeros_like(at_risk)
+        blocked[1:, :] |= at_risk[:-1, :]
+        blocked[:-1, :] |= at_risk[1:, :]
+        blocked[:, 1:] |= at_risk[:, :-1]
+        blocked[:, :-1] |= at_risk[:, 1:]
         
-        # Ensure there's a valid path to the portal
-        if not self.has_path_to_portal():
-            # If no path exists, regenerate the maze
-            self.grid = [[CellType.EMPTY for _ in range(self.height)] for _ in range(self.width)]
-            self.moving_walls = []
-            self.generate_maze()
+        # Don't block the starting position
+        blocked[:3, :3] = True
+        return blocked
     
     def would_block_player(self, x, y):
         """Check if placing a wall at (x,y) would block the player completely"""
         # Don't block the starting position
         if x < 3 and y < 3:
             return True
-            
-        # Don't create 2x2 or larger solid blocks that could trap the player
-        for dx in [-1, 0, 1]:
-            for dy in [-1, 0, 1]:
-                if dx == 0 and dy == 0:
-                    continue
-                    
-                nx, ny = x + dx, y + dy
-                if 0 <= nx < self.width and 0 <= ny < self.height:
-                    # Check if this would create a closed area
-                    if self.would_create_enclosed_area(x, y):
-                        return True
         
-        return False
+        # Don't create closed areas that could trap the player
+        return self.would_create_enclosed_area(x, y)
     
     def would_create_enclosed_area(self, wall_x, wall_y):
-        """Check if adding a wall at (wall_x, wall_y) would create an enclosed area"""
-        # Temporarily place the wall
-        original_cell = self.grid[wall_x][wall_y]
-        self.grid[wall_x][wall_y] = CellType.WALL
-        
-        # Check if any empty cells would become enclosed
-        for x in range(1, self.width - 1):
-            for y in range(1, self.height - 1):
-                if self.grid[x][y] == CellType.EMPTY:
-                    # Check if this cell has no escape route
-                    if self.is_enclosed(x, y):
-                        # Restore the original cell and return True (would create enclosed area)
-                        self.grid[wall_x][wall_y] = original_cell
-                        return True
-        
-        # Restore the original cell and return False (would not create enclosed area)
-        self.grid[wall_x][wall_y] = original_cell
+        """Check if adding a wall at (wall_x, wall_y) would create an enclosed area
+        
+        Generation never lets an empty interior cell become enclosed, so a new
+        wall can only enclose one of its own four neighbours. Those are checked
+        against the maintained wall counts instead of rescanning the grid.
+        """
+        # An existing wall doesn't change any neighbour counts
+        if IS_WALL[self.cells[wall_x, wall_y]]:
+            return False
+        
+        for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
+            nx, ny = wall_x + dx, wall_y + dy
+            if 1 <= nx < self.width - 1 and 1 <= ny < self.height - 1:
+                # An empty cell with three walls around it would lose its last way out
+                if self.cells[nx, ny] == CellType.EMPTY.value and self.wall_neighbors[nx, ny] == 3:
+                    return True
+        
         return False
     
     def is_enclosed(self, x, y):
@@ -324,201 +916,831 @@ class Maze:
         for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
             nx, ny = x + dx, y + dy
             if 0 <= nx < self.width and 0 <= ny < self.height:
-                cell = self.grid[nx][ny]
-                if cell != CellType.WALL and cell != CellType.REFLECTIVE_WALL and cell != CellType.ABSORBING_WALL and cell != CellType.MOVING_WALL:
+                if not IS_WALL[self.cells[nx, ny]]:
                     # There's at least one way out
                     return False
         # All directions are blocked
         return True
     
+    def get_distance_field(self):
+        """Return the walking distances to the portal, computing them if the maze changed"""
+        if self.distance_field is None:
+            # Can move to empty cells, safe paths, and the portal
+            self.distance_field = DistanceField(WALKABLE[self.cells], self.portal_position)
+        elif self.moved_cells is None:
+            self.distance_field.rebuild(WALKABLE[self.cells])
+        elif self.moved_cells:
+            # A cell may have been left and entered again since, so compare with the field
+            cells = np.unique(np.concatenate([x * self.height + y for x, y in self.moved_cells]))
+            xs, ys = np.divmod(cells, self.height)
+            walkable = WALKABLE[self.cells[xs, ys]]
+            was_walkable = self.distance_field.walkable[cells]
+            self.distance_field.update(opened=(xs[walkable & ~was_walkable], ys[walkable & ~was_walkable]),
+                                       closed=(xs[was_walkable & ~walkable], ys[was_walkable & ~walkable]))
+        else:
+            # Nothing moved since the last query
+            return self.distance_field
+        self.moved_cells = []
+        self.moved_count = 0
+        return self.distance_field
+    
     def has_path_to_portal(self):
-        """Check if there's a valid path from the start to the portal using BFS"""
+        """Check if there's a valid path from the start to the portal"""
         if not self.portal_position:
             return False
-            
-        # Starting position
-        start = (1, 1)
-        goal = self.portal_position
+        return self.get_distance_field().is_reachable(1, 1)
+    
+    def repair_path_to_portal(self):
+        """Clear the fewest interior cells needed to connect the start to the portal
         
-        # BFS
-        queue = deque([start])
-        visited = set([start])
+        Turns the blocked cells on the cheapest route into empty cells.
+        """
+        if not self.portal_position:
+            return False
         
-        while queue:
-            x, y = queue.popleft()
-            
-            # Check if we've reached the portal
-            if (x, y) == goal:
-                return True
-                
-            # Try all four directions
-            for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-                nx, ny = x + dx, y + dy
-                
-                # Check if the new position is valid
-                if 0 <= nx < self.width and 0 <= ny < self.height:
-                    cell = self.grid[nx][ny]
-                    
-                    # Can move to empty cells, safe paths, and the portal
-                    if ((cell == CellType.EMPTY or cell == CellType.SAFE_PATH or cell == CellType.PORTAL) and 
-                            (nx, ny) not in visited):
-                        queue.append((nx, ny))
-                        visited.add((nx, ny))
+        # The outer wall is never knocked out
+        route = cheapest_route(self.cells, (1, 1), self.portal_position, 1, 1, self.width - 1, self.height - 1)
+        if route is None:
+            return False
         
-        # No path found
-        return False
+        # Clear anything in the way
+        for x, y in route:
+            if not WALKABLE[self.cells[x, y]]:
+                self.set_cell(x, y, CellType.EMPTY)
+        
+        self.moving_walls.prune(self.cells)
+        return self.has_path_to_portal()
     
     def get_cell(self, x, y):
         if 0 <= x < self.width and 0 <= y < self.height:
-            return self.grid[x][y]
+            return CELL_TYPES[self.cells[x, y]]
         return None
     
     def is_visible(self, x, y):
+        self.refresh_visibility()
         if 0 <= x < self.width and 0 <= y < self.height:
-            return self.visible_grid[x][y]
+            return bool(self.visible_bits[x, y >> 3] & (0x80 >> (y & 7)))
         return False
     
-    def update_visibility(self, pulses):
-        # Reset visibility
-        self.visible_grid = [[False for _ in range(self.height)] for _ in range(self.width)]
+    def update_hash(self, hasher):
+        """Feed the cells, visibility, moving walls and random generators' states into a hashlib hasher"""
+        self.refresh_visibility()
+        for array in (self.cells, self.visible_bits, self.moving_walls.x, self.moving_walls.y,
+                      self.moving_walls.direction):
+            hasher.update(array.tobytes())
+        hasher.update(repr((self.moving_walls.elapsed, self.rng.getstate(), self.np_rng.bit_generator.state)).encode())
+    
+    def take_changed_areas(self):
+        """Return and clear the cell boxes whose appearance changed
+        
+        Anything that updates the maze without drawing it must still call this
+        every tick, or the boxes pile up for the lifetime of the maze.
+        """
+        areas = self.changed_areas
+        self.changed_areas = []
+        return areas
+    
+    def visible_mask(self, x0=0, y0=0, x1=None, y1=None):
+        """Unpack the visibility of the cell box (x0, y0)-(x1, y1) into a boolean array"""
+        self.refresh_visibility()
+        x1 = self.width if x1 is None else x1
+        y1 = self.height if y1 is None else y1
+        # Only unpack the bytes that hold the box's rows
+        bits = np.unpackbits(self.visible_bits[x0:x1, y0 // 8:(y1 + 7) // 8], axis=1)
+        return bits[:, y0 % 8:y0 % 8 + (y1 - y0)].view(bool)
+    
+    def reveal(self, x0, y0, mask):
+        """OR a boolean mask with its top-left corner at (x0, y0) into the visibility bitmap"""
+        # Pad the mask out to whole bytes so it packs straight into place
+        lead = y0 & 7
+        columns, rows = mask.shape
+        padded = np.zeros((columns, (lead + rows + 7) // 8 * 8), dtype=bool)
+        padded[:, lead:lead + rows] = mask
+        
+        first_byte = y0 >> 3
+        packed = np.packbits(padded, axis=1)
+        self.visible_bits[x0:x0 + columns, first_byte:first_byte + packed.shape[1]] |= packed
+    
+    def defer_visibility(self, pulses):
+        """Make visibility follow pulses as they are now, but only work it out once something reads it
         
-        # Update visibility based on active pulses
-        for pulse in pulses:
-            if not pulse.active:
-                continue
-                
+        Until then, pulses emitted later are left out and the cells are taken
+        as they are, so wall steps work out any deferred visibility first.
+        """
+        self.deferred_pulses = (pulses, pulses.next_serial)
+    
+    def refresh_visibility(self):
+        """Work out the visibility deferred by defer_visibility, if any"""
+        if self.deferred_pulses is not None:
+            pulses, before = self.deferred_pulses
+            self.update_visibility(pulses, before)
+    
+    def update_visibility(self, pulses, before=None):
+        """Reveal what the active pulses reach, leaving out any with a serial of before or later"""
+        self.deferred_pulses = None
+        # Reset visibility, keeping last frame's bitmap to see what changed
+        self.previous_visible_bits, self.visible_bits = self.visible_bits, self.previous_visible_bits
+        self.visible_bits.fill(0)
+        
+        # Update visibility based on the active pulses of a PulseSystem
+        for pulse_x, pulse_y, pulse_type, pulse_radius in pulses.live(before):
             # Calculate the maximum distance the pulse has traveled
-            max_distance = pulse.radius / GRID_SIZE
+            max_distance = pulse_radius / GRID_SIZE
+            stencil = disc_stencil(max_distance)
+            radius = stencil.shape[0] // 2
             
-            # Check cells within the pulse radius
-            for x in range(max(0, int(pulse.x - max_distance)), min(self.width, int(pulse.x + max_distance + 1))):
-                for y in range(max(0, int(pulse.y - max_distance)), min(self.height, int(pulse.y + max_distance + 1))):
-                    # Calculate distance from pulse center to cell
-                    distance = ((x - pulse.x) ** 2 + (y - pulse.y) ** 2) ** 0.5
-                    
-                    if distance <= max_distance:
-                        cell_type = self.grid[x][y]
-                        
-                        # Red pulse reveals traps
-                        if pulse.type == PulseType.RED and cell_type == CellType.TRAP:
-                            self.visible_grid[x][y] = True
-                        
-                        # Green pulse reveals safe paths
-                        elif pulse.type == PulseType.GREEN and cell_type == CellType.SAFE_PATH:
-                            self.visible_grid[x][y] = True
-                        
-                        # Blue pulse reveals portals
-                        elif pulse.type == PulseType.BLUE and cell_type == CellType.PORTAL:
-                            self.visible_grid[x][y] = True
-                        
-                        # All pulses reveal walls
-                        elif cell_type in [CellType.WALL, CellType.REFLECTIVE_WALL, CellType.ABSORBING_WALL, CellType.MOVING_WALL]:
-                            self.visible_grid[x][y] = True
+            # Clip the stencil's square to the maze
+            x0 = max(0, pulse_x - radius)
+            x1 = min(self.width, pulse_x + radius + 1)
+            y0 = max(0, pulse_y - radius)
+            y1 = min(self.height, pulse_y + radius + 1)
+            if x0 >= x1 or y0 >= y1:
+                continue
+            in_range = stencil[x0 - (pulse_x - radius):x1 - (pulse_x - radius),
+                               y0 - (pulse_y - radius):y1 - (pulse_y - radius)]
+            
+            # Red pulses reveal traps, green safe paths, blue portals, and all pulses reveal walls
+            revealed = REVEALED_BY[pulse_type][self.cells[x0:x1, y0:y1]]
+            self.reveal(x0, y0, in_range & revealed)
+        
+        # Record the box around every cell that appeared or disappeared
+        changed = self.visible_bits ^ self.previous_visible_bits
+        columns = np.flatnonzero(changed.any(axis=1))
+        if columns.size:
+            row_bytes = np.flatnonzero(changed.any(axis=0))
+            self.changed_areas.append((int(columns[0]), int(row_bytes[0]) * 8,
+                                       int(columns[-1]) + 1, min(self.height, (int(row_bytes[-1]) + 1) * 8)))
     
     def update_moving_walls(self, dt):
-        new_moving_walls = []
+        """Advance the moving walls by dt seconds
         
-        for x, y, direction in self.moving_walls:
-            # Remove the wall from its current position
-            self.grid[x][y] = CellType.EMPTY
-            
-            # Calculate new position
-            dx, dy = direction.value
-            new_x, new_y = x + dx, y + dy
+        Returns one (old_x, old_y, new_x, new_y) array tuple per step taken,
+        describing the walls that moved.
+        """
+        return [self.step_moving_walls() for _ in range(self.moving_walls.steps_due(dt))]
+    
+    def step_moving_walls(self):
+        """Move every moving wall one step and return (old_x, old_y, new_x, new_y) of those that moved"""
+        # Deferred visibility is for the cells before the walls move
+        self.refresh_visibility()
+        walls = self.moving_walls
+        movers, new_x, new_y = walls.plan_step(self.cells, self.np_rng)
+        old_x, old_y = walls.x[movers], walls.y[movers]
+        walls.move(movers, new_x, new_y)
+        
+        # Targets were empty, so this is a wall leaving one cell and arriving in another
+        self.cells[old_x, old_y] = CellType.EMPTY.value
+        self.cells[new_x, new_y] = CellType.MOVING_WALL.value
+        for dx, dy in DIRECTION_STEPS:
+            # Moving walls stay inside the outer walls, so every neighbour exists
+            np.subtract.at(self.wall_neighbors, (old_x + dx, old_y + dy), 1)
+            np.add.at(self.wall_neighbors, (new_x + dx, new_y + dy), 1)
+        if self.distance_field is not None and self.moved_cells is not None:
+            self.moved_cells.extend(((old_x, old_y), (new_x, new_y)))
+            self.moved_count += 2 * old_x.size
+            if not self.distance_field.can_repair(self.moved_count):
+                self.moved_cells = None
+        
+        # Walls are only drawn where visible, and they move into empty cells that
+        # can't be, so only the cells left behind in view look different now.
+        # Visibility catches up with the new positions on its next update
+        shown = (self.visible_bits[old_x, old_y >> 3] & (0x80 >> (old_y & 7))) != 0
+        self.changed_areas.extend((x, y, x + 1, y + 1)
+                                  for x, y in zip(old_x[shown].tolist(), old_y[shown].tolist()))
+        return old_x, old_y, new_x, new_y
+    
+    def draw(self, screen, camera_offset_x, camera_offset_y, area=None):
+        """Draw the cells overlapping area, a screen rect that defaults to the whole screen"""
+        if area is None:
+            area = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        
+        # Grid lines for every cell, blitted from the pre-rendered layer
+        maze_rect = pygame.Rect(-camera_offset_x, -camera_offset_y, self.width * GRID_SIZE, self.height * GRID_SIZE)
+        target = area.clip(maze_rect)
+        if not target:
+            return
+        layer_x = -(camera_offset_x % GRID_SIZE)
+        layer_y = -(camera_offset_y % GRID_SIZE)
+        screen.blit(get_grid_layer(), target.topleft, target.move(-layer_x, -layer_y))
+        
+        # Only visit the cells that overlap the area
+        x0 = (target.left + camera_offset_x) // GRID_SIZE
+        x1 = (target.right - 1 + camera_offset_x) // GRID_SIZE + 1
+        y0 = (target.top + camera_offset_y) // GRID_SIZE
+        y1 = (target.bottom - 1 + camera_offset_y) // GRID_SIZE + 1
+        
+        # Revealed cells cover their grid lines with a tile from the atlas
+        cells = self.cells[x0:x1, y0:y1]
+        shown = self.visible_mask(x0, y0, x1, y1) & (cells != CellType.EMPTY.value)
+        xs, ys = np.nonzero(shown)
+        if not xs.size:
+            return
+        
+        atlas = get_tile_atlas()
+        screen.blits([(atlas, (x * GRID_SIZE - camera_offset_x, y * GRID_SIZE - camera_offset_y),
+                       (value * GRID_SIZE, 0, GRID_SIZE, GRID_SIZE))
+                      for x, y, value in zip((xs + x0).tolist(), (ys + y0).tolist(), cells[xs, ys].tolist())],
+                     doreturn=False)
+
+class MazeChunk:
+    """One square of a ChunkedMaze: its cells, moving walls and generator, in coordinates local to the chunk"""
+    
+    def __init__(self, x0, y0, cells, moving_walls, np_rng):
+        # Maze coordinates of the chunk's top-left cell
+        self.x0 = x0
+        self.y0 = y0
+        self.cells = cells
+        self.moving_walls = moving_walls
+        # Moving walls turn with draws from the chunk's own generator, whatever else is loaded
+        self.np_rng = np_rng
+    
+    @property
+    def nbytes(self):
+        return self.cells.nbytes + len(self.moving_walls) * 9
+    
+    def to_compact(self):
+        """Pack the chunk for eviction: its compressed cells and moving walls, and its generator's state"""
+        walls = self.moving_walls
+        data = zlib.compress(b''.join([self.cells.tobytes(), walls.x.tobytes(), walls.y.tobytes(),
+                                       walls.direction.tobytes()]))
+        return data, len(walls), walls.elapsed, self.np_rng.bit_generator.state
+    
+    @classmethod
+    def from_compact(cls, x0, y0, width, height, compact):
+        """Unpack a chunk evicted by to_compact()"""
+        data, wall_count, elapsed, np_rng_state = compact
+        data = np.frombuffer(zlib.decompress(data), dtype=np.uint8)
+        cells_end = width * height
+        walls = MovingWalls()
+        walls.x = data[cells_end:cells_end + wall_count * 4].view(np.int32).copy()
+        walls.y = data[cells_end + wall_count * 4:cells_end + wall_count * 8].view(np.int32).copy()
+        walls.direction = data[cells_end + wall_count * 8:].view(np.int8).copy()
+        walls.elapsed = elapsed
+        np_rng = np.random.default_rng()
+        np_rng.bit_generator.state = np_rng_state
+        return cls(x0, y0, data[:cells_end].reshape(width, height).copy(), walls, np_rng)
+
+class ChunkedMaze:
+    """A maze generated one CHUNK_SIZE square at a time, as the player gets near each part of it
+    
+    Stands in for Maze wherever the game plays one, for levels too large to
+    generate up front. Each chunk is generated from a seed of its own derived
+    from the maze's, so chunks can be generated in any order and always come
+    out the same. Neighbouring chunks share a gap in their common border, also
+    picked from a seed of its own, and every chunk carves routes joining its
+    gaps, the start and the portal, so the start always reaches the portal.
+    
+    Once the live chunks take more than memory_budget bytes, the least
+    recently used are evicted. A chunk without moving walls is dropped and
+    generated again when next needed; any other is kept compressed.
+    """
+    
+    def __init__(self, width, height, level, seed=None, memory_budget=CHUNK_MEMORY_BUDGET):
+        self.width = width
+        self.height = height
+        self.level = level
+        self.seed = seed
+        self.rng = random.Random(seed)
+        # Every chunk's and gap's seed is derived from this
+        self.base_seed = self.rng.getrandbits(64)
+        self.chunks_x = -(-width // CHUNK_SIZE)
+        self.chunks_y = -(-height // CHUNK_SIZE)
+        self.portal_position = (self.rng.randint(width // 2, width - 2), self.rng.randint(1, height - 2))
+        
+        # Live chunks by (chunk x, chunk y), least recently used first, and evicted ones in compact form
+        self.chunks = OrderedDict()
+        self.evicted = {}
+        self.live_bytes = 0
+        self.memory_budget = memory_budget
+        # Boolean masks of the visible cells of each chunk with any in view
+        self.visible = {}
+        # Cell boxes (x0, y0, x1, y1) that look different since take_changed_areas was last called
+        self.changed_areas = []
+    
+    def chunk_rng(self, *key):
+        """Return a generator seeded from the maze's seed and key"""
+        return np.random.default_rng([self.base_seed, *key])
+    
+    def chunk_box(self, cx, cy):
+        """Return the cell box (x0, y0, x1, y1) covered by a chunk"""
+        x0, y0 = cx * CHUNK_SIZE, cy * CHUNK_SIZE
+        return x0, y0, min(x0 + CHUNK_SIZE, self.width), min(y0 + CHUNK_SIZE, self.height)
+    
+    def get_chunk(self, cx, cy):
+        """Return a live chunk, generating or unpacking it first if needed"""
+        key = (cx, cy)
+        chunk = self.chunks.get(key)
+        if chunk is not None:
+            self.chunks.move_to_end(key)
+            return chunk
+        
+        compact = self.evicted.pop(key, None)
+        if compact is not None:
+            x0, y0, x1, y1 = self.chunk_box(cx, cy)
+            chunk = MazeChunk.from_compact(x0, y0, x1 - x0, y1 - y0, compact)
+        else:
+            chunk = self.generate_chunk(cx, cy)
+        self.chunks[key] = chunk
+        self.live_bytes += chunk.nbytes
+        self.evict()
+        return chunk
+    
+    def evict(self):
+        """Evict the least recently used chunks until the live ones fit the memory budget"""
+        # Chunks in view are never evicted
+        candidates = [key for key in self.chunks if key not in self.visible]
+        # The chunk just loaded is the last one and always stays
+        for key in candidates[:-1]:
+            if self.live_bytes <= self.memory_budget:
+                break
+            chunk = self.chunks.pop(key)
+            self.live_bytes -= chunk.nbytes
+            # Its walls may have moved since it was generated
+            if len(chunk.moving_walls):
+                self.evicted[key] = chunk.to_compact()
+    
+    def gap(self, axis, cx, cy, lo, hi):
+        """Return where in lo to hi the gap lies on the border after chunk (cx, cy) along axis (0 for x, 1 for y)"""
+        return int(self.chunk_rng(1 + axis, cx, cy).integers(lo, hi))
+    
+    def chunk_targets(self, cx, cy):
+        """Return the cells a chunk must connect: its border gaps, and the start and portal if it holds them"""
+        x0, y0, x1, y1 = self.chunk_box(cx, cy)
+        # The chunk's cells inside the outer walls
+        ix0, iy0 = max(x0, 1), max(y0, 1)
+        ix1, iy1 = min(x1, self.width - 1), min(y1, self.height - 1)
+        if ix0 >= ix1 or iy0 >= iy1:
+            return []
+        
+        targets = []
+        if cx > 0:
+            targets.append((x0, self.gap(0, cx - 1, cy, iy0, iy1)))
+        if x1 < self.width - 1:
+            targets.append((x1 - 1, self.gap(0, cx, cy, iy0, iy1)))
+        if cy > 0:
+            targets.append((self.gap(1, cx, cy - 1, ix0, ix1), y0))
+        if y1 < self.height - 1:
+            targets.append((self.gap(1, cx, cy, ix0, ix1), y1 - 1))
+        for x, y in [(1, 1), self.portal_position]:
+            if x0 <= x < x1 and y0 <= y < y1:
+                targets.append((x, y))
+        return targets
+    
+    def generate_chunk(self, cx, cy):
+        """Generate a chunk from its seed
+        
+        Walls, traps and safe paths are scattered with the same densities and
+        level-dependent wall types as a whole maze, then the chunk's targets
+        are joined by clearing the cheapest routes between them.
+        """
+        x0, y0, x1, y1 = self.chunk_box(cx, cy)
+        width, height = x1 - x0, y1 - y0
+        np_rng = self.chunk_rng(0, cx, cy)
+        cells = np.zeros((width, height), dtype=np.uint8)
+        
+        # Random walls
+        wall_count = (width * height) // 5
+        xs = np_rng.integers(0, width, size=wall_count)
+        ys = np_rng.integers(0, height, size=wall_count)
+        reflective, absorbing, moving = np_rng.random((3, wall_count)) < np.array([[0.2], [0.2], [0.1]])
+        # Moving walls start inside the chunk's edge, and never leave it (see MovingWalls.plan_step)
+        moving &= (self.level >= 4) & (xs >= 1) & (xs < width - 1) & (ys >= 1) & (ys < height - 1)
+        values = np.full(wall_count, CellType.WALL.value, dtype=np.uint8)
+        values[moving] = CellType.MOVING_WALL.value
+        values[absorbing & (self.level >= 2)] = CellType.ABSORBING_WALL.value
+        values[reflective & (self.level >= 3)] = CellType.REFLECTIVE_WALL.value
+        cells[xs, ys] = values
+        
+        walls = MovingWalls()
+        on_moving = values == CellType.MOVING_WALL.value
+        walls.x = xs[on_moving].astype(np.int32)
+        walls.y = ys[on_moving].astype(np.int32)
+        walls.direction = np_rng.integers(0, len(DIRECTION_STEPS), size=len(walls.x)).astype(np.int8)
+        
+        # Traps and safe paths go on empty cells
+        for cell_type, count in [(CellType.TRAP, (width * height) // 10), (CellType.SAFE_PATH, (width * height) // 8)]:
+            xs = np_rng.integers(0, width, size=count)
+            ys = np_rng.integers(0, height, size=count)
+            empty = cells[xs, ys] == CellType.EMPTY.value
+            cells[xs[empty], ys[empty]] = cell_type.value
+        
+        # The maze's outer walls
+        if x0 == 0:
+            cells[0, :] = CellType.WALL.value
+        if y0 == 0:
+            cells[:, 0] = CellType.WALL.value
+        if x1 == self.width:
+            cells[-1, :] = CellType.WALL.value
+        if y1 == self.height:
+            cells[:, -1] = CellType.WALL.value
+        
+        # Make sure the starting area is clear
+        cells[max(1 - x0, 0):max(3 - x0, 0), max(1 - y0, 0):max(3 - y0, 0)] = CellType.EMPTY.value
+        
+        targets = [(x - x0, y - y0) for x, y in self.chunk_targets(cx, cy)]
+        for x, y in targets:
+            if not WALKABLE[cells[x, y]]:
+                cells[x, y] = CellType.EMPTY.value
+        portal_x, portal_y = self.portal_position
+        if x0 <= portal_x < x1 and y0 <= portal_y < y1:
+            cells[portal_x - x0, portal_y - y0] = CellType.PORTAL.value
+        
+        # Join every target to the first, never through the outer walls
+        bounds = (int(x0 == 0), int(y0 == 0), width - int(x1 == self.width), height - int(y1 == self.height))
+        for target in targets[1:]:
+            for x, y in cheapest_route(cells, targets[0], target, *bounds):
+                if not WALKABLE[cells[x, y]]:
+                    cells[x, y] = CellType.EMPTY.value
+        
+        walls.prune(cells)
+        return MazeChunk(x0, y0, cells, walls, np_rng)
+    
+    def get_cell(self, x, y):
+        if 0 <= x < self.width and 0 <= y < self.height:
+            chunk = self.get_chunk(x // CHUNK_SIZE, y // CHUNK_SIZE)
+            return CELL_TYPES[chunk.cells[x - chunk.x0, y - chunk.y0]]
+        return None
+    
+    def is_visible(self, x, y):
+        mask = self.visible.get((x // CHUNK_SIZE, y // CHUNK_SIZE))
+        if mask is not None and 0 <= x < self.width and 0 <= y < self.height:
+            return bool(mask[x % CHUNK_SIZE, y % CHUNK_SIZE])
+        return False
+    
+    def update_hash(self, hasher):
+        """Feed the live chunks, visibility and random generator's state into a hashlib hasher"""
+        for key in sorted(self.chunks):
+            chunk = self.chunks[key]
+            walls = chunk.moving_walls
+            hasher.update(repr((key, walls.elapsed, chunk.np_rng.bit_generator.state)).encode())
+            for array in (chunk.cells, walls.x, walls.y, walls.direction):
+                hasher.update(array.tobytes())
+        for key in sorted(self.visible):
+            hasher.update(repr(key).encode())
+            hasher.update(self.visible[key].tobytes())
+        hasher.update(repr(self.rng.getstate()).encode())
+    
+    def take_changed_areas(self):
+        """Return and clear the cell boxes whose appearance changed"""
+        areas = self.changed_areas
+        self.changed_areas = []
+        return areas
+    
+    def defer_visibility(self, pulses):
+        # Working out visibility generates the chunks it reaches, which later ticks
+        # depend on, so unlike Maze.defer_visibility this can't wait
+        self.update_visibility(pulses)
+    
+    def update_visibility(self, pulses):
+        visible = {}
+        for pulse_x, pulse_y, pulse_type, pulse_radius in pulses.live():
+            # The pulse's stencil, clipped to the maze as in Maze.update_visibility
+            stencil = disc_stencil(pulse_radius / GRID_SIZE)
+            radius = stencil.shape[0] // 2
+            x0 = max(0, pulse_x - radius)
+            x1 = min(self.width, pulse_x + radius + 1)
+            y0 = max(0, pulse_y - radius)
+            y1 = min(self.height, pulse_y + radius + 1)
+            if x0 >= x1 or y0 >= y1:
+                continue
             
-            # Check if the new position is valid
-            if (1 <= new_x < self.width - 1 and 1 <= new_y < self.height - 1 and 
-                self.grid[new_x][new_y] == CellType.EMPTY):
-                # Move the wall
-                self.grid[new_x][new_y] = CellType.MOVING_WALL
-                new_moving_walls.append((new_x, new_y, direction))
+            # Reveal the part of the square inside each chunk it overlaps
+            for cx in range(x0 // CHUNK_SIZE, (x1 - 1) // CHUNK_SIZE + 1):
+                for cy in range(y0 // CHUNK_SIZE, (y1 - 1) // CHUNK_SIZE + 1):
+                    chunk = self.get_chunk(cx, cy)
+                    cx0, cy0 = max(x0, chunk.x0), max(y0, chunk.y0)
+                    cx1 = min(x1, chunk.x0 + chunk.cells.shape[0])
+                    cy1 = min(y1, chunk.y0 + chunk.cells.shape[1])
+                    in_range = stencil[cx0 - (pulse_x - radius):cx1 - (pulse_x - radius),
+                                       cy0 - (pulse_y - radius):cy1 - (pulse_y - radius)]
+                    local = (slice(cx0 - chunk.x0, cx1 - chunk.x0), slice(cy0 - chunk.y0, cy1 - chunk.y0))
+                    
+                    mask = visible.get((cx, cy))
+                    if mask is None:
+                        mask = visible[(cx, cy)] = np.zeros(chunk.cells.shape, dtype=bool)
+                    mask[local] |= in_range & REVEALED_BY[pulse_type][chunk.cells[local]]
+        
+        # Record the box around every cell that appeared or disappeared, chunk by chunk
+        for key in visible.keys() | self.visible.keys():
+            mask, previous = visible.get(key), self.visible.get(key)
+            if mask is None or previous is None:
+                changed = mask if previous is None else previous
             else:
-                # Change direction if blocked
-                new_direction = random.choice(list(Direction))
-                self.grid[x][y] = CellType.MOVING_WALL
-                new_moving_walls.append((x, y, new_direction))
+                changed = mask ^ previous
+            columns = np.flatnonzero(changed.any(axis=1))
+            if columns.size:
+                rows = np.flatnonzero(changed.any(axis=0))
+                x0, y0 = key[0] * CHUNK_SIZE, key[1] * CHUNK_SIZE
+                self.changed_areas.append((x0 + int(columns[0]), y0 + int(rows[0]),
+                                           x0 + int(columns[-1]) + 1, y0 + int(rows[-1]) + 1))
+        self.visible = visible
+    
+    def update_moving_walls(self, dt):
+        """Advance the moving walls of every live chunk by dt seconds
+        
+        Walls in chunks that aren't live stand still. Returns one (old_x, old_y,
+        new_x, new_y) array tuple per chunk step taken, like Maze.update_moving_walls.
+        """
+        moved = []
+        for key, chunk in self.chunks.items():
+            if len(chunk.moving_walls):
+                moved.extend(self.step_moving_walls(key, chunk) for _ in range(chunk.moving_walls.steps_due(dt)))
+        return moved
+    
+    def step_moving_walls(self, key, chunk):
+        """Move a chunk's moving walls one step and return (old_x, old_y, new_x, new_y) of those that moved"""
+        walls = chunk.moving_walls
+        movers, new_x, new_y = walls.plan_step(chunk.cells, chunk.np_rng)
+        old_x, old_y = walls.x[movers], walls.y[movers]
+        walls.move(movers, new_x, new_y)
+        chunk.cells[old_x, old_y] = CellType.EMPTY.value
+        chunk.cells[new_x, new_y] = CellType.MOVING_WALL.value
+        
+        # As in Maze.step_moving_walls, only cells left behind in view look different now
+        mask = self.visible.get(key)
+        if mask is not None:
+            shown = mask[old_x, old_y]
+            self.changed_areas.extend((x, y, x + 1, y + 1) for x, y in
+                                      zip((old_x[shown] + chunk.x0).tolist(), (old_y[shown] + chunk.y0).tolist()))
+        return old_x + chunk.x0, old_y + chunk.y0, new_x + chunk.x0, new_y + chunk.y0
+    
+    def draw(self, screen, camera_offset_x, camera_offset_y, area=None):
+        """Draw the cells overlapping area, a screen rect that defaults to the whole screen"""
+        if area is None:
+            area = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
+        
+        maze_rect = pygame.Rect(-camera_offset_x, -camera_offset_y, self.width * GRID_SIZE, self.height * GRID_SIZE)
+        target = area.clip(maze_rect)
+        if not target:
+            return
+        layer_x = -(camera_offset_x % GRID_SIZE)
+        layer_y = -(camera_offset_y % GRID_SIZE)
+        screen.blit(get_grid_layer(), target.topleft, target.move(-layer_x, -layer_y))
+        
+        x0 = (target.left + camera_offset_x) // GRID_SIZE
+        x1 = (target.right - 1 + camera_offset_x) // GRID_SIZE + 1
+        y0 = (target.top + camera_offset_y) // GRID_SIZE
+        y1 = (target.bottom - 1 + camera_offset_y) // GRID_SIZE + 1
+        
+        # Only cells in view are drawn, so only chunks with some in view are visited
+        atlas = get_tile_atlas()
+        tiles = []
+        for key, mask in self.visible.items():
+            chunk = self.chunks.get(key)
+            if chunk is None:
+                continue
+            width, height = chunk.cells.shape
+            local = (slice(max(x0 - chunk.x0, 0), max(min(x1 - chunk.x0, width), 0)),
+                     slice(max(y0 - chunk.y0, 0), max(min(y1 - chunk.y0, height), 0)))
+            cells = chunk.cells[local]
+            xs, ys = np.nonzero(mask[local] & (cells != CellType.EMPTY.value))
+            tiles.extend((atlas, (x * GRID_SIZE - camera_offset_x, y * GRID_SIZE - camera_offset_y),
+                          (value * GRID_SIZE, 0, GRID_SIZE, GRID_SIZE))
+                         for x, y, value in zip((xs + chunk.x0 + local[0].start).tolist(),
+                                                (ys + chunk.y0 + local[1].start).tolist(), cells[xs, ys].tolist()))
+        if tiles:
+            screen.blits(tiles, doreturn=False)
+
+class DirtyRegions:
+    """Collects the screen areas that need redrawing before the next frame is shown"""
+    
+    def __init__(self):
+        self.rects = []
+        self.full_redraw = True
+    
+    def mark(self, rect):
+        self.rects.append(pygame.Rect(rect))
+    
+    def mark_all(self):
+        self.full_redraw = True
+    
+    def take(self, screen_rect):
+        """Return the merged rects to redraw, or None when the whole screen must be redrawn"""
+        rects = self.rects
+        full_redraw = self.full_redraw
+        self.rects = []
+        self.full_redraw = False
+        if full_redraw:
+            return None
+        
+        # Merge overlapping rects so no area is drawn twice
+        merged = []
+        for rect in rects:
+            rect = rect.clip(screen_rect)
+            if rect.width == 0 or rect.height == 0:
+                continue
+            
+            while True:
+                index = rect.collidelist(merged)
+                if index == -1:
+                    break
+                rect.union_ip(merged.pop(index))
+            merged.append(rect)
+        
+        # Past half the screen a single full redraw is cheaper
+        if sum(rect.width * rect.height for rect in merged) > screen_rect.width * screen_rect.height // 2:
+            return None
+        return merged
+
+def generate_maze_state(width, height, level, seed=None):
+    """Generate a maze in a worker process and return its get_state()"""
+    return Maze(width, height, level, seed).get_state()
+
+class MazePregenerator:
+    """Generates upcoming mazes in a worker process while the current level is played
+    
+    Without a worker (disabled, or the platform can't start one) every maze is
+    simply generated on request.
+    """
+    
+    def __init__(self, enabled=True):
+        self.executor = None
+        # (width, height, level, seed) -> future of generate_maze_state
+        self.pending = {}
+        if enabled:
+            try:
+                # Spawned rather than forked, so the worker never inherits pygame's threads
+                self.executor = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn'))
+            except (OSError, NotImplementedError) as e:
+                print(f"Generating mazes in the foreground: {e}")
+    
+    def prefetch(self, *specs):
+        """Start generating a maze for each (width, height, level, seed) spec, dropping any other pending work"""
+        for spec in list(self.pending):
+            if spec not in specs:
+                self.pending.pop(spec).cancel()
+        if self.executor is None:
+            return
         
-        self.moving_walls = new_moving_walls
+        for spec in specs:
+            if spec not in self.pending:
+                try:
+                    self.pending[spec] = self.executor.submit(generate_maze_state, *spec)
+                except RuntimeError as e:
+                    # The pool broke or was shut down; carry on without it
+                    print(f"Generating mazes in the foreground: {e}")
+                    self.executor = None
+                    return
     
-    def draw(self, screen, camera_offset_x, camera_offset_y):
-        for x in range(self.width):
-            for y in range(self.height):
-                cell_type = self.grid[x][y]
-                is_visible = self.visible_grid[x][y]
-                
-                # Calculate screen position
-                screen_x = x * GRID_SIZE - camera_offset_x
-                screen_y = y * GRID_SIZE - camera_offset_y
-                
-                # Skip if outside screen
-                if (screen_x + GRID_SIZE < 0 or screen_x > SCREEN_WIDTH or 
-                    screen_y + GRID_SIZE < 0 or screen_y > SCREEN_HEIGHT):
-                    continue
-                
-                # Draw cell based on type and visibility
-                if cell_type == CellType.EMPTY:
-                    # Draw grid lines
-                    pygame.draw.rect(screen, GRAY, (screen_x, screen_y, GRID_SIZE, GRID_SIZE), 1)
-                elif is_visible:
-                    if cell_type == CellType.WALL:
-                        pygame.draw.rect(screen, WHITE, (screen_x, screen_y, GRID_SIZE, GRID_SIZE))
-                    elif cell_type == CellType.TRAP:
-                        pygame.draw.rect(screen, RED, (screen_x, screen_y, GRID_SIZE, GRID_SIZE))
-                    elif cell_type == CellType.SAFE_PATH:
-                        pygame.draw.rect(screen, GREEN, (screen_x, screen_y, GRID_SIZE, GRID_SIZE))
-                    elif cell_type == CellType.PORTAL:
-                        pygame.draw.rect(screen, BLUE, (screen_x, screen_y, GRID_SIZE, GRID_SIZE))
-                    elif cell_type == CellType.REFLECTIVE_WALL:
-                        pygame.draw.rect(screen, (200, 200, 200), (screen_x, screen_y, GRID_SIZE, GRID_SIZE))
-                    elif cell_type == CellType.ABSORBING_WALL:
-                        pygame.draw.rect(screen, (50, 50, 50), (screen_x, screen_y, GRID_SIZE, GRID_SIZE))
-                    elif cell_type == CellType.MOVING_WALL:
-                        pygame.draw.rect(screen, (150, 100, 200), (screen_x, screen_y, GRID_SIZE, GRID_SIZE))
-                else:
-                    # Draw grid lines for unexplored areas
-                    pygame.draw.rect(screen, GRAY, (screen_x, screen_y, GRID_SIZE, GRID_SIZE), 1)
+    def take(self, width, height, level, seed=None):
+        """Return a maze for the spec, from the worker if it was asked for one
+        
+        A maze still queued is generated here instead. One already being
+        generated is waited for, since that finishes sooner than starting over.
+        """
+        future = self.pending.pop((width, height, level, seed), None)
+        if future is not None and (future.running() or future.done()):
+            try:
+                return Maze.from_state(future.result())
+            except Exception as e:
+                print(f"Maze worker failed, generating in the foreground: {e}")
+        elif future is not None:
+            future.cancel()
+        return Maze(width, height, level, seed)
+    
+    def shutdown(self):
+        if self.executor is not None:
+            # Cancelled by hand, as shutdown(cancel_futures=True) needs Python 3.9
+            for future in self.pending.values():
+                future.cancel()
+            self.executor.shutdown(wait=False)
+            self.executor = None
+        self.pending = {}
 
 class GameManager:
-    def __init__(self):
-        # Initialize display in fullscreen mode if enabled
-        if FULLSCREEN:
-            self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-            # Get the actual screen dimensions
-            info = pygame.display.Info()
-            global SCREEN_WIDTH, SCREEN_HEIGHT
-            SCREEN_WIDTH = info.current_w
-            SCREEN_HEIGHT = info.current_h
+    def __init__(self, headless=HEADLESS, clock=None, level_pack=LEVEL_PACK_PATH, seed=SEED, maze_size=MAZE_SIZE,
+                 record=RECORD_PATH):
+        # Time to first frame is measured from here
+        self.start_perf_time = time.perf_counter()
+        self.time_to_first_frame = None
+        self.headless = headless
+        init_pygame(headless)
+        
+        # The loop's time source; headless runs default to one that only moves with the simulation
+        if clock is None:
+            clock = SimulatedClock() if headless else MonotonicClock()
+        self.game_clock = clock
+        
+        # Fraction of the desktop resolution, or fixed (width, height), drawn at in fullscreen
+        self.render_scale = RENDER_SCALE
+        # The display surface when frames are drawn off screen and upscaled by hand, otherwise None
+        self.display = None
+        if headless:
+            # No window, fonts or sounds
+            self.screen = None
         else:
-            self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-            
-        pygame.display.set_caption("Color Echo Maze")
-        self.clock = pygame.time.Clock()
-        self.font = pygame.font.SysFont('Arial', 24)
-        self.small_font = pygame.font.SysFont('Arial', 18)
+            self.set_display_mode()
         
-        # Load sound effects
-        self.load_sounds()
+        self.clock = pygame.time.Clock()
+        # Sounds and system fonts load in the background and are used once ready
+        self.assets = AssetLoader()
+        self.audio = AudioManager(self.assets, SOUND_CHANNELS, SOUND_SETTINGS)
+        # Fonts by size, and rendered HUD text by slot; both are cleared on resolution changes
+        self.fonts = {}
+        self.text_cache = {}
+        self.message_overlay = None
+        # Fonts being stood in for until they load
+        self.pending_fonts = set()
+        
+        if not headless:
+            # Load sound effects
+            self.load_sounds()
         
         self.level = 1
-        self.maze_width = 20 + self.level * 2
-        self.maze_height = 15 + self.level * 2
+        # Ticks simulated since the game started, across levels
+        self.ticks = 0
+        
+        # Every maze's seed is derived from the game's seed and how many mazes came before it
+        self.seed = random.getrandbits(64) if seed is None else seed
+        self.maze_count = 0
+        self.maze_size = maze_size
+        # Key presses and state hashes are logged here for play_replay.py
+        self.recorder = ReplayRecorder(record, self.seed, TICK_RATE, maze_size) if record else None
         
         # Calculate time limit based on level
         self.time_limit = self.calculate_time_limit()
         
-        self.maze = Maze(self.maze_width, self.maze_height, self.level)
+        # Levels come from the pack while it lasts. The next level's maze and a
+        # spare for restarting are generated while this one is played
+        self.level_pack = LevelPack(level_pack) if level_pack else None
+        self.pregenerator = MazePregenerator(enabled=PREGENERATE_MAZES and not headless)
+        self.maze = self.get_level_maze(self.level)
+        self.maze_width, self.maze_height = self.maze.width, self.maze.height
+        self.prefetch_mazes()
         self.player = Player(1, 1)
-        self.pulses = []
+        self.pulses = PulseSystem()
         
         self.game_over = False
         self.level_complete = False
         self.time_expired = False  # New flag for time expiration
-        self.start_time = time.time()
         self.elapsed_time = 0
         
-        # Camera offset
+        # Camera offset, and where it was after the previous tick
         self.camera_offset_x = 0
         self.camera_offset_y = 0
+        self.previous_camera_offset = (0, 0)
+        
+        # How far the display is between the previous tick and the latest one (0 to 1)
+        self.render_alpha = 1.0
+        
+        # Screen areas that changed since the last frame, and what the last frame showed
+        self.dirty = DirtyRegions()
+        self.last_frame_state = None
+        self.last_hud_state = None
+        self.last_pulse_rects = []
+        
+        # Frame timing, on from the start only when the data is being exported
+        self.timer = FrameTimer(enabled=FRAME_STATS_PATH is not None)
+        self.show_frame_stats = False
+        self.frame_stats_lines = []
+        self.frame_stats_refreshed = 0.0
+        self.frame_stats_rect = None
+        self.profiler = FrameProfiler(PROFILE_FRAMES)
+    
+    def set_display_mode(self):
+        """Open the display for the FULLSCREEN setting and render scale, and size SCREEN_WIDTH and SCREEN_HEIGHT to it
+        
+        Everything is drawn at SCREEN_WIDTH x SCREEN_HEIGHT. Below full scale,
+        fullscreen frames are upscaled to the desktop by SDL's renderer in
+        pygame's SCALED mode, or where there is no renderer, drawn off screen
+        and upscaled with one smoothscale blit per frame.
+        """
+        global SCREEN_WIDTH, SCREEN_HEIGHT
+        self.display = None
+        if pygame.display.get_surface() is not None:
+            # SDL can't give a window that already has a renderer or surface a new one, so start afresh
+            pygame.display.quit()
+            pygame.display.init()
+        pygame.display.set_caption("Color Echo Maze")
+        if not FULLSCREEN:
+            self.screen = pygame.display.set_mode((800, 600))
+        else:
+            native_size = pygame.display.get_desktop_sizes()[0]
+            size = render_resolution(native_size, self.render_scale)
+            if size == native_size:
+                self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+            else:
+                try:
+                    self.screen = pygame.display.set_mode(size, pygame.FULLSCREEN | pygame.SCALED)
+                except pygame.error as e:
+                    print(f"Warning: Could not use SCALED mode, scaling frames in software. Error: {e}")
+                    self.display = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
+                    self.screen = pygame.Surface(size).convert()
+        SCREEN_WIDTH, SCREEN_HEIGHT = self.screen.get_size()
+    
+    def cycle_render_scale(self):
+        """Switch to the next of RENDER_SCALES, taking effect in fullscreen"""
+        if self.render_scale in RENDER_SCALES:
+            self.render_scale = RENDER_SCALES[(RENDER_SCALES.index(self.render_scale) + 1) % len(RENDER_SCALES)]
+        else:
+            self.render_scale = RENDER_SCALES[0]
+        if not FULLSCREEN:
+            print(f"Render scale: {self.render_scale:.0%} in fullscreen")
+            return
+        self.set_display_mode()
+        self.clear_text_caches()
+        self.dirty.mark_all()
+        print(f"Render scale: {self.render_scale:.0%} ({SCREEN_WIDTH}x{SCREEN_HEIGHT})")
     
     # Add this new method to calculate time limit based on level
     def calculate_time_limit(self):
@@ -526,21 +1748,8 @@ class GameManager:
         return BASE_TIME_LIMIT + (self.level - 1) * 30
     
     def load_sounds(self):
-        # Create a dictionary to store our sounds
-        self.sounds = {}
-        
-        # Try to load each sound file, with error handling in case files don't exist
-        try:
-            self.sounds['move'] = pygame.mixer.Sound(SOUND_MOVE)
-            self.sounds['red_pulse'] = pygame.mixer.Sound(SOUND_RED_PULSE)
-            self.sounds['green_pulse'] = pygame.mixer.Sound(SOUND_GREEN_PULSE)
-            self.sounds['blue_pulse'] = pygame.mixer.Sound(SOUND_BLUE_PULSE)
-            self.sounds['game_over'] = pygame.mixer.Sound(SOUND_GAME_OVER)
-            self.sounds['level_complete'] = pygame.mixer.Sound(SOUND_LEVEL_COMPLETE)
-        except Exception as e:
-            print(f"Warning: Could not load sound files. Error: {e}")
-            # Create empty dictionary if sounds can't be loaded
-            self.sounds = {}
+        """Start decoding every sound in the background; a sound that fails to load stays silent"""
+        self.audio.load(SOUND_FILES)
     
     def handle_events(self):
         for event in pygame.event.get():
@@ -552,112 +1761,121 @@ class GameManager:
                     return False
                 
                 # Toggle fullscreen with F11
-                if event.key == pygame.K_F11:
+                elif event.key == pygame.K_F11:
                     global FULLSCREEN
                     FULLSCREEN = not FULLSCREEN
-                    if FULLSCREEN:
-                        self.screen = pygame.display.set_mode((0, 0), pygame.FULLSCREEN)
-                        info = pygame.display.Info()
-                        global SCREEN_WIDTH, SCREEN_HEIGHT
-                        SCREEN_WIDTH = info.current_w
-                        SCREEN_HEIGHT = info.current_h
-                    else:
-                        SCREEN_WIDTH = 800
-                        SCREEN_HEIGHT = 600
-                        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+                    self.set_display_mode()
+                    self.clear_text_caches()
+                    self.dirty.mark_all()
                 
-                # Player movement
-                if not self.game_over and not self.level_complete and not self.time_expired:
-                    moved = False
-                    if event.key == pygame.K_UP:
-                        moved = self.player.move(Direction.UP, self.maze)
-                    elif event.key == pygame.K_DOWN:
-                        moved = self.player.move(Direction.DOWN, self.maze)
-                    elif event.key == pygame.K_LEFT:
-                        moved = self.player.move(Direction.LEFT, self.maze)
-                    elif event.key == pygame.K_RIGHT:
-                        moved = self.player.move(Direction.RIGHT, self.maze)
-                    
-                    # Play movement sound if player moved
-                    if moved and 'move' in self.sounds:
-                        self.sounds['move'].play()
-                    
-                    # Manual pulse emission (still available but not necessary with auto pulses)
-                    if event.key == pygame.K_r:
-                        pulse = self.player.emit_pulse(PulseType.RED, self.maze)
-                        if pulse:
-                            self.pulses.append(pulse)
-                            # Play red pulse sound
-                            if 'red_pulse' in self.sounds:
-                                self.sounds['red_pulse'].play()
-                    elif event.key == pygame.K_g:
-                        pulse = self.player.emit_pulse(PulseType.GREEN, self.maze)
-                        if pulse:
-                            self.pulses.append(pulse)
-                            # Play green pulse sound
-                            if 'green_pulse' in self.sounds:
-                                self.sounds['green_pulse'].play()
-                    elif event.key == pygame.K_b:
-                        pulse = self.player.emit_pulse(PulseType.BLUE, self.maze)
-                        if pulse:
-                            self.pulses.append(pulse)
-                            # Play blue pulse sound
-                            if 'blue_pulse' in self.sounds:
-                                self.sounds['blue_pulse'].play()
+                # Cycle the fullscreen render scale with F8
+                elif event.key == pygame.K_F8:
+                    self.cycle_render_scale()
                 
-                # Restart level if game over or time expired
-                if (self.game_over or self.time_expired) and event.key == pygame.K_SPACE:
-                    self.restart_level()
+                # Toggle the frame timing overlay with F3
+                elif event.key == pygame.K_F3:
+                    self.show_frame_stats = not self.show_frame_stats
+                    self.timer.enabled = self.show_frame_stats or FRAME_STATS_PATH is not None
+                    self.frame_stats_lines = []
                 
-                # Next level if level complete
-                if self.level_complete and event.key == pygame.K_SPACE:
-                    self.next_level()
+                # Profile the next few frames with F9
+                elif event.key == pygame.K_F9:
+                    self.profiler.request()
+                
+                else:
+                    self.handle_key(event.key)
         
         return True
     
-    def update(self, dt):
+    def handle_key(self, key):
+        """Apply a key press to the game; every key that changes the game state comes through here"""
+        if self.recorder:
+            self.recorder.key(self.ticks, key)
+        
+        # Player movement
+        if not self.game_over and not self.level_complete and not self.time_expired:
+            moved = False
+            old_x, old_y = self.player.x, self.player.y
+            if key == pygame.K_UP:
+                moved = self.player.move(Direction.UP, self.maze)
+            elif key == pygame.K_DOWN:
+                moved = self.player.move(Direction.DOWN, self.maze)
+            elif key == pygame.K_LEFT:
+                moved = self.player.move(Direction.LEFT, self.maze)
+            elif key == pygame.K_RIGHT:
+                moved = self.player.move(Direction.RIGHT, self.maze)
+            
+            if moved:
+                self.mark_cell_dirty(old_x, old_y)
+                self.mark_cell_dirty(self.player.x, self.player.y)
+                # Play movement sound if player moved
+                self.audio.play('move')
+            
+            # Manual pulse emission (still available but not necessary with auto pulses)
+            if key == pygame.K_r:
+                if self.player.emit_pulse(PulseType.RED, self.pulses):
+                    # Play red pulse sound
+                    self.audio.play('red_pulse')
+            elif key == pygame.K_g:
+                if self.player.emit_pulse(PulseType.GREEN, self.pulses):
+                    # Play green pulse sound
+                    self.audio.play('green_pulse')
+            elif key == pygame.K_b:
+                if self.player.emit_pulse(PulseType.BLUE, self.pulses):
+                    # Play blue pulse sound
+                    self.audio.play('blue_pulse')
+        
+        # Restart level if game over or time expired
+        if (self.game_over or self.time_expired) and key == pygame.K_SPACE:
+            self.restart_level()
+        
+        # Next level if level complete
+        if self.level_complete and key == pygame.K_SPACE:
+            self.next_level()
+    
+    def update(self, dt=TICK):
+        """Advance the game by one fixed tick of dt seconds"""
+        if self.recorder and self.ticks % REPLAY_HASH_INTERVAL == 0:
+            self.recorder.hash(self.ticks, self.state_hash())
+        self.ticks += 1
+        self.previous_camera_offset = (self.camera_offset_x, self.camera_offset_y)
         if self.game_over or self.level_complete or self.time_expired:
             return
         
         # Update elapsed time
-        self.elapsed_time = time.time() - self.start_time
+        self.elapsed_time += dt
         
         # Check if time limit has expired
         if self.elapsed_time >= self.time_limit:
             self.time_expired = True
             # Play game over sound
-            if 'game_over' in self.sounds:
-                self.sounds['game_over'].play()
+            self.audio.play('game_over')
             return
         
         # Update player energy
-        self.player.regenerate_energy(dt)
-        
-        # Handle automated pulse emission
-        pulse, pulse_type = self.player.auto_emit_pulse(time.time(), self.maze)
-        if pulse:
-            self.pulses.append(pulse)
-            # Play appropriate sound
-            if pulse_type == PulseType.RED and 'red_pulse' in self.sounds:
-                self.sounds['red_pulse'].play()
-            elif pulse_type == PulseType.GREEN and 'green_pulse' in self.sounds:
-                self.sounds['green_pulse'].play()
-            elif pulse_type == PulseType.BLUE and 'blue_pulse' in self.sounds:
-                self.sounds['blue_pulse'].play()
-        
-        # Update pulses
-        active_pulses = []
-        for pulse in self.pulses:
-            pulse.update(dt)
-            if pulse.active:
-                active_pulses.append(pulse)
-        self.pulses = active_pulses
-        
-        # Update maze visibility based on pulses
-        self.maze.update_visibility(self.pulses)
-        
-        # Update moving walls (every 1 second)
-        if int(self.elapsed_time) % 1 == 0:
+        with self.timer.phase('update.energy'):
+            self.player.regenerate_energy(dt)
+        
+        with self.timer.phase('update.pulses'):
+            # Handle automated pulse emission
+            pulse_type = self.player.auto_emit_pulse(self.elapsed_time, self.maze, self.pulses)
+            if pulse_type:
+                # Play appropriate sound
+                self.audio.play(f"{pulse_type.name.lower()}_pulse")
+            
+            # Update pulses
+            self.pulses.update(dt)
+        
+        # Update maze visibility based on pulses. Headless runs only work it out
+        # when something reads it, such as a state hash
+        with self.timer.phase('update.visibility'):
+            if self.headless:
+                self.maze.defer_visibility(self.pulses)
+            else:
+                self.maze.update_visibility(self.pulses)
+        
+        # Update moving walls (every MOVING_WALL_INTERVAL seconds)
+        with self.timer.phase('update.moving_walls'):
             self.maze.update_moving_walls(dt)
         
         # Check for collisions
@@ -665,53 +1883,267 @@ class GameManager:
         if cell == CellType.TRAP:
             self.game_over = True
             # Play game over sound
-            if 'game_over' in self.sounds:
-                self.sounds['game_over'].play()
+            self.audio.play('game_over')
         elif cell == CellType.PORTAL:
             self.level_complete = True
             # Play level complete sound
-            if 'level_complete' in self.sounds:
-                self.sounds['level_complete'].play()
-        
-        # Update camera to follow player
-        target_camera_x = self.player.x * GRID_SIZE - SCREEN_WIDTH // 2
-        target_camera_y = self.player.y * GRID_SIZE - SCREEN_HEIGHT // 2
+            self.audio.play('level_complete')
         
-        # Smooth camera movement
-        self.camera_offset_x += (target_camera_x - self.camera_offset_x) * 5 * dt
-        self.camera_offset_y += (target_camera_y - self.camera_offset_y) * 5 * dt
-        
-        # Clamp camera to maze bounds
-        self.camera_offset_x = max(0, min(self.camera_offset_x, self.maze.width * GRID_SIZE - SCREEN_WIDTH))
-        self.camera_offset_y = max(0, min(self.camera_offset_y, self.maze.height * GRID_SIZE - SCREEN_HEIGHT))
-
-
+        # Nothing is drawn headless, so the camera can stay put
+        if self.headless:
+            return
+        with self.timer.phase('update.camera'):
+            # Update camera to follow player
+            target_camera_x = self.player.x * GRID_SIZE - SCREEN_WIDTH // 2
+            target_camera_y = self.player.y * GRID_SIZE - SCREEN_HEIGHT // 2
+            
+            # Smooth camera movement
+            self.camera_offset_x += (target_camera_x - self.camera_offset_x) * 5 * dt
+            self.camera_offset_y += (target_camera_y - self.camera_offset_y) * 5 * dt
+            
+            # Clamp camera to maze bounds
+            self.camera_offset_x = max(0, min(self.camera_offset_x, self.maze.width * GRID_SIZE - SCREEN_WIDTH))
+            self.camera_offset_y = max(0, min(self.camera_offset_y, self.maze.height * GRID_SIZE - SCREEN_HEIGHT))
+    
+    def stop_recording(self):
+        """Finish the replay log with the final state, so playback checks the whole game"""
+        self.recorder.hash(self.ticks, self.state_hash())
+        self.recorder.close()
+    
+    def state_hash(self):
+        """Return a 64-bit hash of everything later ticks depend on, to check replays against"""
+        hasher = hashlib.blake2b(digest_size=8)
+        hasher.update(repr((self.ticks, self.level, self.maze_count, self.elapsed_time, self.game_over,
+                            self.level_complete, self.time_expired, self.player.x, self.player.y,
+                            tuple(self.player.pulse_energy.values()), self.player.last_auto_pulse_time)).encode())
+        self.maze.update_hash(hasher)
+        self.pulses.update_hash(hasher)
+        return int.from_bytes(hasher.digest(), 'little')
+    
+    def get_view_offset(self):
+        """Return the camera offset between the last two ticks, rounded to whole pixels, as used for drawing"""
+        previous_x, previous_y = self.previous_camera_offset
+        view_x = previous_x + (self.camera_offset_x - previous_x) * self.render_alpha
+        view_y = previous_y + (self.camera_offset_y - previous_y) * self.render_alpha
+        return int(round(view_x)), int(round(view_y))
+    
+    def get_message(self):
+        """Return the game over, level complete, or time expired message being shown"""
+        if self.game_over:
+            return "Game Over! Press SPACE to restart", RED
+        elif self.time_expired:
+            return "Time's Up! Press SPACE to restart", RED
+        elif self.level_complete:
+            return "Level Complete! Press SPACE for next level", GREEN
+        return None
+    
+    def mark_cell_dirty(self, x, y, x1=None, y1=None):
+        """Mark the screen area of a cell, or of the cell box (x, y)-(x1, y1), for redrawing"""
+        if self.headless:
+            return
+        x1 = x + 1 if x1 is None else x1
+        y1 = y + 1 if y1 is None else y1
+        view_x, view_y = self.get_view_offset()
+        self.dirty.mark((x * GRID_SIZE - view_x, y * GRID_SIZE - view_y,
+                         (x1 - x) * GRID_SIZE, (y1 - y) * GRID_SIZE))
+    
+    def collect_dirty_regions(self):
+        """Mark everything that changed since the last frame"""
+        view_x, view_y = self.get_view_offset()
+        
+        # Scrolling, a new message or a new screen size changes every pixel
+        frame_state = (view_x, view_y, self.get_message(), SCREEN_WIDTH, SCREEN_HEIGHT, self.show_frame_stats)
+        if frame_state != self.last_frame_state:
+            self.dirty.mark_all()
+        self.last_frame_state = frame_state
+        
+        # Text drawn with a stand-in font changes everywhere once the real one loads
+        loaded = {key for key in self.pending_fonts if self.assets.ready(key)}
+        if loaded:
+            self.pending_fonts -= loaded
+            self.dirty.mark_all()
+        
+        # Cells revealed, hidden or moved by the maze
+        for x0, y0, x1, y1 in self.maze.take_changed_areas():
+            self.mark_cell_dirty(x0, y0, x1, y1)
+        
+        # Pulse rings grow and fade every frame, so redraw where they were and where they are
+        pulse_rects = self.pulses.get_rects(view_x, view_y, self.render_alpha)
+        for rect in self.last_pulse_rects + pulse_rects:
+            self.dirty.mark(rect)
+        self.last_pulse_rects = pulse_rects
+        
+        # HUD values, as they would be displayed
+        hud_state = self.get_hud_state()
+        if hud_state != self.last_hud_state and self.last_hud_state is not None:
+            for rect in self.get_hud_rects():
+                self.dirty.mark(rect)
+        self.last_hud_state = hud_state
+        
+        # The frame timing overlay refreshes a few times a second
+        if self.show_frame_stats and time.perf_counter() - self.frame_stats_refreshed >= 0.25:
+            self.refresh_frame_stats()
     
     def draw(self):
-        self.screen.fill(BLACK)
+        self.collect_dirty_regions()
+        screen_rect = self.screen.get_rect()
+        rects = self.dirty.take(screen_rect)
+        
+        if rects is None:
+            self.draw_scene(screen_rect)
+            with self.timer.phase('draw.present'):
+                self.present()
+            return
+        
+        # Redraw every layer inside each changed area and push only those areas
+        for rect in rects:
+            self.screen.set_clip(rect)
+            self.draw_scene(rect)
+        self.screen.set_clip(None)
+        if rects:
+            with self.timer.phase('draw.present'):
+                self.present(rects)
+    
+    def present(self, rects=None):
+        """Show the frame, or just the changed rects of it"""
+        if self.display is not None:
+            # The frame is drawn off screen; upscale all of it in one blit
+            pygame.transform.smoothscale(self.screen, self.display.get_size(), self.display)
+            pygame.display.flip()
+        elif rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(rects)
+    
+    def draw_scene(self, area):
+        """Draw every layer of the frame, restricted to area where the layer allows it"""
+        view_x, view_y = self.get_view_offset()
+        self.screen.fill(BLACK, area)
         
         # Draw maze
-        self.maze.draw(self.screen, self.camera_offset_x, self.camera_offset_y)
+        with self.timer.phase('draw.maze'):
+            self.maze.draw(self.screen, view_x, view_y, area)
         
         # Draw pulses
-        for pulse in self.pulses:
-            pulse.draw(self.screen, self.camera_offset_x, self.camera_offset_y)
+        with self.timer.phase('draw.pulses'):
+            self.pulses.draw(self.screen, view_x, view_y, self.render_alpha)
         
         # Draw player
-        self.player.draw(self.screen, self.camera_offset_x, self.camera_offset_y)
+        self.player.draw(self.screen, view_x, view_y)
         
         # Draw HUD
-        self.draw_hud()
+        with self.timer.phase('draw.hud'):
+            self.draw_hud()
+            
+            # Draw game over, level complete, or time expired message
+            message = self.get_message()
+            if message:
+                self.draw_message(*message)
+            
+            if self.show_frame_stats:
+                self.draw_frame_stats()
+    
+    def refresh_frame_stats(self):
+        """Rebuild the frame timing overlay text from the latest percentiles"""
+        self.frame_stats_refreshed = time.perf_counter()
+        lines = [f"{'phase (ms)':<20}{'p50':>7}{'p95':>7}{'p99':>7}"]
+        for name, stats in self.timer.summary().items():
+            lines.append(f"{name:<20}{stats['p50']:>7.2f}{stats['p95']:>7.2f}{stats['p99']:>7.2f}")
+        self.frame_stats_lines = lines
+        
+        # Redraw where the overlay was and where it will be
+        if self.frame_stats_rect:
+            self.dirty.mark(self.frame_stats_rect)
+        self.frame_stats_rect = self.get_frame_stats_rect()
+        self.dirty.mark(self.frame_stats_rect)
+    
+    def get_frame_stats_rect(self):
+        """Return the screen area of the frame timing overlay, centred at the top"""
+        font = self.get_font(14, 'Courier New')
+        width = max([font.size(line)[0] for line in self.frame_stats_lines] + [1]) + 10
+        height = font.get_linesize() * len(self.frame_stats_lines) + 10
+        return pygame.Rect(SCREEN_WIDTH // 2 - width // 2, 5, width, height)
+    
+    def draw_frame_stats(self):
+        if not self.frame_stats_lines:
+            return
+        rect = self.frame_stats_rect
+        self.screen.fill((0, 0, 0), rect)
+        pygame.draw.rect(self.screen, GRAY, rect, 1)
+        
+        line_height = self.get_font(14, 'Courier New').get_linesize()
+        for index, line in enumerate(self.frame_stats_lines):
+            text = self.render_text(f"frame_stats_{index}", line, 14, YELLOW, 'Courier New')
+            self.screen.blit(text, (rect.x + 5, rect.y + 5 + index * line_height))
+    
+    def get_font(self, size, name='Arial'):
+        """Return the font of the given size
+        
+        System fonts load in the background on first use; pygame's built-in
+        font stands in for them until then.
+        """
+        font = self.fonts.get((name, size))
+        if font is None:
+            key = ('font', name, size)
+            font = self.assets.get(key)
+            if font is None and self.assets.ready(key):
+                # The load failed, so keep the built-in font rather than asking again
+                font = pygame.font.Font(None, size)
+            if font is None:
+                self.assets.load(key, pygame.font.SysFont, name, size)
+                self.pending_fonts.add(key)
+                if (None, size) not in self.fonts:
+                    self.fonts[(None, size)] = pygame.font.Font(None, size)
+                return self.fonts[(None, size)]
+            self.fonts[(name, size)] = font
+        return font
+    
+    def render_text(self, slot, text, size, color, font_name='Arial'):
+        """Render text for a HUD slot, reusing the last surface if nothing about it changed"""
+        font = self.get_font(size, font_name)
+        key = (text, size, color, font_name, font)
+        cached = self.text_cache.get(slot)
+        if cached is None or cached[0] != key:
+            cached = (key, font.render(text, True, color))
+            self.text_cache[slot] = cached
+        return cached[1]
+    
+    def clear_text_caches(self):
+        """Drop fonts and rendered text after the resolution changes"""
+        self.fonts = {}
+        self.text_cache = {}
+        self.message_overlay = None
+    
+    def get_hud_state(self):
+        """Return the HUD values exactly as they are displayed"""
+        bar_width = int(150 * min(SCREEN_WIDTH / 800, SCREEN_HEIGHT / 600))
+        time_remaining = max(0, self.time_limit - self.elapsed_time)
+        next_pulse_in = max(0, AUTO_PULSE_INTERVAL - (self.elapsed_time - self.player.last_auto_pulse_time))
+        # Energy bars can change length before their percentage label does
+        energies = tuple((int(energy), int(bar_width * energy / 100)) for energy in self.player.pulse_energy.values())
+        return energies, self.level, int(time_remaining), time_remaining < 30, f"{next_pulse_in:.1f}"
+    
+    def get_hud_rects(self):
+        """Return the screen areas holding the HUD's changing values"""
+        scale_factor = min(SCREEN_WIDTH / 800, SCREEN_HEIGHT / 600)
+        bar_width = int(150 * scale_factor)
+        bar_height = int(20 * scale_factor)
+        padding = int(10 * scale_factor)
         
-        # Draw game over, level complete, or time expired message
-        if self.game_over:
-            self.draw_message("Game Over! Press SPACE to restart", RED)
-        elif self.time_expired:
-            self.draw_message("Time's Up! Press SPACE to restart", RED)
-        elif self.level_complete:
-            self.draw_message("Level Complete! Press SPACE for next level", GREEN)
+        font = self.get_font(int(24 * scale_factor))
+        small_font = self.get_font(int(18 * scale_factor))
         
-        pygame.display.flip()
+        # Energy bars and their labels
+        label_width = small_font.size("Green (G): 100%")[0] + 5
+        bars = pygame.Rect(0, 0, padding * 2 + max(bar_width, label_width), padding * 4 + bar_height * 3)
+        
+        # Level, time remaining and the auto-pulse timer, right aligned
+        text_height = font.get_linesize() * 2 + small_font.get_linesize()
+        text_width = max(font.size(f"Time: {int(self.time_limit)}s")[0],
+                         small_font.size("Next pulse in: 0.0s")[0])
+        timers = pygame.Rect(SCREEN_WIDTH - text_width * 2 - padding, 0, text_width * 2 + padding,
+                             padding * 4 + text_height)
+        return [bars, timers]
     
     def draw_hud(self):
         # Calculate scaling factors for HUD elements based on screen size
@@ -721,32 +2153,29 @@ class GameManager:
         padding = int(10 * scale_factor)
         
         # Adjust font sizes based on screen resolution
-        if not hasattr(self, 'scaled_font'):
-            font_size = int(24 * scale_factor)
-            small_font_size = int(18 * scale_factor)
-            self.scaled_font = pygame.font.SysFont('Arial', font_size)
-            self.scaled_small_font = pygame.font.SysFont('Arial', small_font_size)
+        font_size = int(24 * scale_factor)
+        small_font_size = int(18 * scale_factor)
         
         # Red pulse energy
         pygame.draw.rect(self.screen, (50, 0, 0), (padding, padding, bar_width, bar_height))
         pygame.draw.rect(self.screen, RED, (padding, padding, int(bar_width * self.player.pulse_energy[PulseType.RED] / 100), bar_height))
-        red_text = self.scaled_small_font.render(f"Red (R): {int(self.player.pulse_energy[PulseType.RED])}%", True, WHITE)
+        red_text = self.render_text('red_energy', f"Red (R): {int(self.player.pulse_energy[PulseType.RED])}%", small_font_size, WHITE)
         self.screen.blit(red_text, (padding + 5, padding + 2))
         
         # Green pulse energy
         pygame.draw.rect(self.screen, (0, 50, 0), (padding, padding * 2 + bar_height, bar_width, bar_height))
         pygame.draw.rect(self.screen, GREEN, (padding, padding * 2 + bar_height, int(bar_width * self.player.pulse_energy[PulseType.GREEN] / 100), bar_height))
-        green_text = self.scaled_small_font.render(f"Green (G): {int(self.player.pulse_energy[PulseType.GREEN])}%", True, WHITE)
+        green_text = self.render_text('green_energy', f"Green (G): {int(self.player.pulse_energy[PulseType.GREEN])}%", small_font_size, WHITE)
         self.screen.blit(green_text, (padding + 5, padding * 2 + bar_height + 2))
         
         # Blue pulse energy
         pygame.draw.rect(self.screen, (0, 0, 50), (padding, padding * 3 + bar_height * 2, bar_width, bar_height))
         pygame.draw.rect(self.screen, BLUE, (padding, padding * 3 + bar_height * 2, int(bar_width * self.player.pulse_energy[PulseType.BLUE] / 100), bar_height))
-        blue_text = self.scaled_small_font.render(f"Blue (B): {int(self.player.pulse_energy[PulseType.BLUE])}%", True, WHITE)
+        blue_text = self.render_text('blue_energy', f"Blue (B): {int(self.player.pulse_energy[PulseType.BLUE])}%", small_font_size, WHITE)
         self.screen.blit(blue_text, (padding + 5, padding * 3 + bar_height * 2 + 2))
         
         # Level and time
-        level_text = self.scaled_font.render(f"Level: {self.level}", True, WHITE)
+        level_text = self.render_text('level', f"Level: {self.level}", font_size, WHITE)
         self.screen.blit(level_text, (SCREEN_WIDTH - level_text.get_width() - padding, padding))
         
         # Show time remaining instead of elapsed time
@@ -754,109 +2183,219 @@ class GameManager:
         time_color = WHITE
         if time_remaining < 30:  # Turn red when less than 30 seconds remain
             time_color = RED
-        time_text = self.scaled_font.render(f"Time: {int(time_remaining)}s", True, time_color)
+        time_text = self.render_text('time', f"Time: {int(time_remaining)}s", font_size, time_color)
         self.screen.blit(time_text, (SCREEN_WIDTH - time_text.get_width() - padding, padding * 2 + level_text.get_height()))
         
         # Auto-pulse timer
-        next_pulse_in = max(0, AUTO_PULSE_INTERVAL - (time.time() - self.player.last_auto_pulse_time))
-        pulse_timer_text = self.scaled_small_font.render(f"Next pulse in: {next_pulse_in:.1f}s", True, WHITE)
+        next_pulse_in = max(0, AUTO_PULSE_INTERVAL - (self.elapsed_time - self.player.last_auto_pulse_time))
+        pulse_timer_text = self.render_text('pulse_timer', f"Next pulse in: {next_pulse_in:.1f}s", small_font_size, WHITE)
         self.screen.blit(pulse_timer_text, (SCREEN_WIDTH - pulse_timer_text.get_width() - padding, 
                                         padding * 3 + level_text.get_height() + time_text.get_height()))
         
         # Legend
         legend_y = SCREEN_HEIGHT - int(120 * scale_factor)  # Moved up to make room for instructions
-        legend_text = self.scaled_small_font.render("Legend:", True, WHITE)
+        legend_text = self.render_text('legend', "Legend:", small_font_size, WHITE)
         self.screen.blit(legend_text, (padding, legend_y))
         
         legend_box_size = int(15 * scale_factor)
         legend_spacing = int(20 * scale_factor)
         
         pygame.draw.rect(self.screen, RED, (padding, legend_y + legend_spacing, legend_box_size, legend_box_size))
-        red_legend = self.scaled_small_font.render("Red (R): Reveals traps", True, WHITE)
+        red_legend = self.render_text('red_legend', "Red (R): Reveals traps", small_font_size, WHITE)
         self.screen.blit(red_legend, (padding + legend_box_size + 5, legend_y + legend_spacing))
         
         pygame.draw.rect(self.screen, GREEN, (padding, legend_y + legend_spacing * 2, legend_box_size, legend_box_size))
-        green_legend = self.scaled_small_font.render("Green (G): Reveals safe paths", True, WHITE)
+        green_legend = self.render_text('green_legend', "Green (G): Reveals safe paths", small_font_size, WHITE)
         self.screen.blit(green_legend, (padding + legend_box_size + 5, legend_y + legend_spacing * 2))
         
         pygame.draw.rect(self.screen, BLUE, (padding, legend_y + legend_spacing * 3, legend_box_size, legend_box_size))
-        blue_legend = self.scaled_small_font.render("Blue (B): Reveals portals", True, WHITE)
+        blue_legend = self.render_text('blue_legend', "Blue (B): Reveals portals", small_font_size, WHITE)
         self.screen.blit(blue_legend, (padding + legend_box_size + 5, legend_y + legend_spacing * 3))
         
         # Instructions
-        instructions = self.scaled_small_font.render("Arrow Keys: Move | Auto-pulses every 4s | Find the blue portal within time limit", True, WHITE)
+        instructions = self.render_text('instructions', "Arrow Keys: Move | Auto-pulses every 4s | Find the blue portal within time limit", small_font_size, WHITE)
         self.screen.blit(instructions, (SCREEN_WIDTH // 2 - instructions.get_width() // 2, SCREEN_HEIGHT - padding * 2))
     
     def draw_message(self, message, color):
-        overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
-        overlay.fill((0, 0, 0, 150))
-        self.screen.blit(overlay, (0, 0))
+        # Reuse the translucent overlay until the screen size changes
+        if self.message_overlay is None or self.message_overlay.get_size() != (SCREEN_WIDTH, SCREEN_HEIGHT):
+            self.message_overlay = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+            self.message_overlay.fill((0, 0, 0, 150))
+        self.screen.blit(self.message_overlay, (0, 0))
         
         # Scale message font based on screen size
         scale_factor = min(SCREEN_WIDTH / 800, SCREEN_HEIGHT / 600)
         font_size = int(32 * scale_factor)  # Larger font for messages
-        message_font = pygame.font.SysFont('Arial', font_size)
         
-        text = message_font.render(message, True, color)
+        text = self.render_text('message', message, font_size, color)
         text_rect = text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
         self.screen.blit(text, text_rect)
     
+    def get_maze_size(self, level):
+        """Return the width and height of the maze played on level"""
+        return self.maze_size or level_size(level)
+    
+    def get_maze_seed(self, index):
+        """Return the seed of the game's index-th maze"""
+        digest = hashlib.blake2b(f"{self.seed}:{index}".encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'little')
+    
+    def get_level_maze(self, level):
+        """Return a fresh maze for level, loaded from the level pack if it has one
+        
+        Mazes too large to generate up front are chunked and built as they are explored.
+        """
+        seed = self.get_maze_seed(self.maze_count)
+        self.maze_count += 1
+        if self.level_pack is not None and level <= len(self.level_pack):
+            return Maze.from_bytes(self.level_pack[level - 1])
+        width, height = self.get_maze_size(level)
+        if width * height > CHUNKED_MAZE_CELLS:
+            return ChunkedMaze(width, height, level, seed)
+        return self.pregenerator.take(width, height, level, seed)
+    
+    def prefetch_mazes(self):
+        """Have the mazes for restarting and for the next level generated in the background"""
+        pack_levels = len(self.level_pack) if self.level_pack is not None else 0
+        # Either one is the next maze made
+        seed = self.get_maze_seed(self.maze_count)
+        specs = [(*self.get_maze_size(level), level, seed) for level in (self.level, self.level + 1)
+                 if level > pack_levels]
+        self.pregenerator.prefetch(*[spec for spec in specs if spec[0] * spec[1] <= CHUNKED_MAZE_CELLS])
+    
     def restart_level(self):
         # Keep the current screen mode when restarting
-        self.maze = Maze(self.maze_width, self.maze_height, self.level)
+        self.maze = self.get_level_maze(self.level)
+        self.prefetch_mazes()
         self.player = Player(1, 1)
-        self.pulses = []
+        self.pulses.clear()
         self.game_over = False
         self.level_complete = False
         self.time_expired = False
-        self.start_time = time.time()
         self.elapsed_time = 0
         
         # Recalculate time limit for current level
         self.time_limit = self.calculate_time_limit()
+        self.dirty.mark_all()
     
     def next_level(self):
         # Keep the current screen mode when advancing to next level
         self.level += 1
-        self.maze_width = 20 + self.level * 2
-        self.maze_height = 15 + self.level * 2
-        self.maze = Maze(self.maze_width, self.maze_height, self.level)
+        self.maze = self.get_level_maze(self.level)
+        self.maze_width, self.maze_height = self.maze.width, self.maze.height
+        self.prefetch_mazes()
         self.player = Player(1, 1)
-        self.pulses = []
+        self.pulses.clear()
         self.game_over = False
         self.level_complete = False
         self.time_expired = False
-        self.start_time = time.time()
         self.elapsed_time = 0
         
         # Calculate new time limit for the next level
         self.time_limit = self.calculate_time_limit()
+        self.dirty.mark_all()
     
     def run(self):
-        last_time = time.time()
+        if self.headless:
+            self.run_headless()
+            return
+        
+        # Real time not yet simulated; logic runs in fixed ticks however fast frames are drawn
+        accumulator = 0.0
+        last_time = self.game_clock.time()
         
         while True:
+            self.profiler.begin_frame()
+            
             # Calculate delta time
-            current_time = time.time()
-            dt = current_time - last_time
+            current_time = self.game_clock.time()
+            accumulator += current_time - last_time
             last_time = current_time
             
             # Handle events
-            if not self.handle_events():
+            with self.timer.phase('events'):
+                running = self.handle_events()
+            if not running:
                 break
             
-            # Update game state
-            self.update(dt)
+            # Update game state one tick at a time, dropping time the game can't catch up on
+            with self.timer.phase('update'):
+                ticks = 0
+                while accumulator >= TICK and ticks < MAX_TICKS_PER_FRAME:
+                    self.update(TICK)
+                    accumulator -= TICK
+                    ticks += 1
+                accumulator = min(accumulator, TICK)
+            
+            # Draw the moving parts part way to the next tick; a finished level is drawn as it ended
+            if self.game_over or self.level_complete or self.time_expired:
+                self.render_alpha = 1.0
+            else:
+                self.render_alpha = min(1.0, accumulator / TICK)
             
             # Draw everything
-            self.draw()
+            with self.timer.phase('draw'):
+                self.draw()
+            if self.time_to_first_frame is None:
+                self.time_to_first_frame = time.perf_counter() - self.start_perf_time
+                print(f"First frame shown {self.time_to_first_frame * 1e3:.0f} ms after start")
             
             # Cap the frame rate
-            self.clock.tick(FPS)
+            with self.timer.phase('tick'):
+                self.clock.tick(FPS)
+            self.timer.end_frame()
+            self.profiler.end_frame()
+        
+        self.profiler.close()
+        if self.recorder:
+            self.stop_recording()
+            print(f"Replay written to {self.recorder.path}")
+        self.pregenerator.shutdown()
+        self.assets.shutdown()
+        if self.level_pack is not None:
+            self.level_pack.close()
+        if FRAME_STATS_PATH:
+            self.timer.export(FRAME_STATS_PATH)
+            print(f"Frame timings written to {FRAME_STATS_PATH}")
         
         pygame.quit()
         sys.exit()
+    
+    def run_headless(self, max_seconds=None):
+        """Simulate the current level as fast as possible, without drawing
+        
+        Runs until the level ends or max_seconds of game time have passed, and
+        returns the number of ticks. The game clock must be one that can be
+        advanced, such as a SimulatedClock.
+        """
+        frames = 0
+        
+        while not (self.game_over or self.level_complete or self.time_expired):
+            if max_seconds is not None and frames * TICK >= max_seconds:
+                break
+            
+            self.game_clock.advance(TICK)
+            self.update(TICK)
+            frames += 1
+            
+            # Nothing is drawn; see Maze.take_changed_areas
+            self.maze.take_changed_areas()
+        
+        return frames
 
-if __name__ == "__main__":
+def main():
     game = GameManager()
-    game.run()
+    if game.headless:
+        # Report how far the simulation got and how quickly
+        wall_start = time.perf_counter()
+        frames = game.run_headless()
+        wall_time = time.perf_counter() - wall_start
+        print(f"Level {game.level}: {frames} updates, {game.elapsed_time:.1f} game seconds "
+              f"in {wall_time:.2f}s ({game.elapsed_time / max(wall_time, 1e-9):.0f}x real time)")
+        if game.recorder:
+            game.stop_recording()
+    else:
+        game.run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""Distance fields for finding the way to a goal cell, such as a maze's portal.
+
+A DistanceField holds the walking distance from every cell to the goal in a
+flat array indexed x * height + y. Reachability and distance queries are
+single lookups, and a shortest path is read off by walking downhill. When
+a few cells open up or close, update() repairs only the part of the field
+that depended on them instead of searching the whole grid again.
+"""
+import numpy as np
+
+# Distance of cells with no path to the goal
+UNREACHABLE = -1
+
+# Work is counted in cells searched by recompute(), which also pays this much
+# per ring it expands. The costs below were measured with the distance_field and
+# distance_field_update benchmarks
+RECOMPUTE_RING_COST = 100
+# What a repair pays per cell it settles and per ring it expands
+REPAIR_CELL_COST = 10
+REPAIR_RING_COST = 250
+# The repair work a single changed cell leads to, on average
+CHANGE_COST = 2500
+# An update only tries a repair it expects to cost less than this fraction of
+# recompute(), and gives it up once it has spent that much
+REPAIR_BUDGET = 1 / 3
+
+
+class RepairTooCostly(Exception):
+    """Raised inside DistanceField.update when a repair outgrows its budget"""
+
+
+class DistanceField:
+    """Walking distances to a goal cell over a grid of walkable cells"""
+
+    def __init__(self, walkable, goal):
+        """walkable is a boolean [x, y] array whose outer border is never walkable; goal is an (x, y) cell or None"""
+        self.width, self.height = walkable.shape
+        # Copied, since update() keeps it in step with the grid
+        self.walkable = np.array(walkable, dtype=bool).ravel()
+        self.goal = None if goal is None else goal[0] * self.height + goal[1]
+        # The border is never walkable, so stepping by these from a walkable cell never leaves the grid
+        self.offsets = (1, -1, self.height, -self.height)
+        # Scratch space for dropping repeated cells
+        self.slots = np.empty(self.walkable.size, dtype=np.int32)
+        self.recompute()
+
+    def recompute(self):
+        """Rebuild the whole field with a breadth-first search out from the goal"""
+        self.distances = np.full(self.walkable.size, UNREACHABLE, dtype=np.int32)
+        if self.goal is None or not self.walkable[self.goal]:
+            self.budget = 0
+            return
+
+        # Expand a whole ring of cells per step
+        offsets = np.array(self.offsets)
+        self.distances[self.goal] = 0
+        frontier = np.array([self.goal])
+        distance = 0
+        while frontier.size:
+            distance += 1
+            neighbors = (frontier[:, None] + offsets).ravel()
+            neighbors = neighbors[self.walkable[neighbors] & (self.distances[neighbors] == UNREACHABLE)]
+            # Drop cells reached from more than one side
+            frontier = self.unique(neighbors)
+            self.distances[frontier] = distance
+        # Repairs are measured against what this search just cost
+        self.budget = (self.walkable.size + distance * RECOMPUTE_RING_COST) * REPAIR_BUDGET
+
+    def distance(self, x, y):
+        """Return the number of steps from (x, y) to the goal, or None if it can't be reached"""
+        distance = int(self.distances[x * self.height + y])
+        return None if distance == UNREACHABLE else distance
+
+    def is_reachable(self, x, y):
+        return self.distances[x * self.height + y] != UNREACHABLE
+
+    def path(self, x, y):
+        """Return a shortest path from (x, y) to the goal as a list of cells, both ends included
+
+        Returns None if the goal can't be reached.
+        """
+        index = x * self.height + y
+        distance = self.distances[index]
+        if distance == UNREACHABLE:
+            return None
+
+        path = [(x, y)]
+        while distance > 0:
+            # Some neighbour is always one step closer
+            for offset in self.offsets:
+                if self.distances[index + offset] == distance - 1:
+                    index += offset
+                    break
+            distance -= 1
+            path.append(divmod(index, self.height))
+        return path
+
+    def rebuild(self, walkable):
+        """Search again over a new grid of walkable cells, the same shape as before"""
+        self.walkable[:] = walkable.ravel()
+        self.recompute()
+
+    def can_repair(self, changes):
+        """Whether update() would try repairing this many changed cells rather than call recompute()"""
+        return changes * CHANGE_COST <= self.budget
+
+    def update(self, opened=((), ()), closed=((), ())):
+        """Repair the field after cells became walkable (opened) or blocked (closed)
+
+        Both are (xs, ys) pairs of coordinate sequences.
+        """
+        opened = np.asarray(opened[0], dtype=np.int64) * self.height + np.asarray(opened[1], dtype=np.int64)
+        closed = np.asarray(closed[0], dtype=np.int64) * self.height + np.asarray(closed[1], dtype=np.int64)
+        self.walkable[opened] = True
+        self.walkable[closed] = False
+
+        if not self.can_repair(opened.size + closed.size):
+            self.recompute()
+            return
+        try:
+            invalidated, budget = self.invalidate(closed, self.budget)
+            self.relax(np.concatenate((invalidated, opened)), budget)
+        except RepairTooCostly:
+            self.recompute()
+
+    def unique(self, cells):
+        """Drop repeats from an array of cells without sorting it"""
+        order = np.arange(cells.size, dtype=np.int32)
+        # Each cell keeps the one slot written last for it
+        self.slots[cells] = order
+        return cells[self.slots[cells] == order]
+
+    def invalidate(self, closed, budget):
+        """Clear the distances of closed cells and of every cell whose shortest routes all ran through them
+
+        Works outwards a ring of cleared cells at a time. Returns the cleared
+        cells that are still walkable and what is left of budget, and raises
+        RepairTooCostly once the work done passes budget.
+        """
+        distances = self.distances
+        offsets = np.array(self.offsets)
+        frontier = closed[distances[closed] != UNREACHABLE]
+        distances[frontier] = UNREACHABLE
+        invalidated = []
+        while frontier.size:
+            # Cells next to the ring just cleared may have relied on it. A cell keeps its
+            # distance while any neighbour is still one step closer; one that loses that
+            # neighbour later comes up again when the neighbour is cleared
+            candidates = self.unique((frontier[:, None] + offsets).ravel())
+            candidates = candidates[distances[candidates] != UNREACHABLE]
+            candidate_distances = distances[candidates]
+            supported = (distances[candidates[:, None] + offsets] == (candidate_distances - 1)[:, None]).any(axis=1)
+            frontier = candidates[~supported]
+            distances[frontier] = UNREACHABLE
+            invalidated.append(frontier)
+            budget -= frontier.size * REPAIR_CELL_COST + REPAIR_RING_COST
+            if budget < 0:
+                raise RepairTooCostly()
+        return np.concatenate(invalidated) if invalidated else np.zeros(0, dtype=np.int64), budget
+
+    def relax(self, cells, budget):
+        """Give cells, and anything they bring closer, their shortest distance
+
+        A breadth-first search in which each cell joins once the search reaches
+        the distance its neighbours offer it. Raises RepairTooCostly once the
+        work done passes budget.
+        """
+        distances = self.distances
+        walkable = self.walkable
+        offsets = np.array(self.offsets)
+        cells = cells[walkable[cells]]
+        reached = distances[cells[:, None] + offsets]
+        # Unreachable neighbours offer nothing
+        reached = np.where(reached == UNREACHABLE, np.iinfo(np.int32).max - 1, reached)
+        offered = reached.min(axis=1) + 1
+        order = np.argsort(offered, kind='stable')
+        cells, offered = cells[order], offered[order]
+        # Cells with no reachable neighbour are only reached through the search, if at all
+        waiting = np.searchsorted(offered, np.iinfo(np.int32).max)
+
+        start = 0
+        frontier = cells[:0]
+        distance = offered[0] if waiting else 0
+        while frontier.size or start < waiting:
+            if not frontier.size:
+                distance = offered[start]
+            end = np.searchsorted(offered[:waiting], distance, 'right')
+            frontier = self.unique(np.concatenate((frontier, cells[start:end])))
+            start = end
+            current = distances[frontier]
+            frontier = frontier[(current == UNREACHABLE) | (current > distance)]
+            distances[frontier] = distance
+            budget -= frontier.size * REPAIR_CELL_COST + REPAIR_RING_COST
+            if budget < 0:
+                raise RepairTooCostly()
+
+            neighbors = (frontier[:, None] + offsets).ravel()
+            frontier = neighbors[walkable[neighbors]]
+            distance += 1
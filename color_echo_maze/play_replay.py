@@ -0,0 +1,88 @@
+"""Play back a game recorded with ``python main.py --record game.replay``.
+
+By default the recording is simulated headless as fast as possible, checking
+the game state against every hash stored during play and reporting the first
+tick where they differ. With --render the game is drawn as it replays, at
+--speed times real time.
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+import main
+from main import TICK_RATE, GameManager
+from replay import REPLAY_HASH, REPLAY_KEY, ReplayReader
+
+
+def replay(path, render=False, speed=1.0, level_pack=None):
+    """Replay a recording; returns (game, hashes matched, tick of the first mismatch or None)"""
+    with ReplayReader(path) as log:
+        if log.tick_rate != TICK_RATE:
+            raise ValueError(f"{path} was recorded at {log.tick_rate} ticks per second, not {TICK_RATE}")
+        game = GameManager(headless=not render, level_pack=level_pack, seed=log.seed, maze_size=log.maze_size,
+                           record=None)
+
+        def tick():
+            game.update()
+            if not render:
+                # Nothing is drawn; see Maze.take_changed_areas
+                game.maze.take_changed_areas()
+                return
+            if any(event.type == pygame.QUIT for event in pygame.event.get()):
+                raise KeyboardInterrupt
+            game.draw()
+            game.clock.tick(TICK_RATE * speed)
+
+        matched = 0
+        for kind, at_tick, value in log:
+            while game.ticks < at_tick:
+                tick()
+            if kind == REPLAY_KEY:
+                game.handle_key(value)
+            elif kind == REPLAY_HASH:
+                if game.state_hash() != value:
+                    return game, matched, at_tick
+                matched += 1
+        return game, matched, None
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(prog='python play_replay.py',
+                                     description="Replay a recorded game and check it plays out the same way.")
+    parser.add_argument('replay', help="recording made with main.py --record")
+    parser.add_argument('--render', action='store_true', help="draw the game in a window while replaying")
+    parser.add_argument('--speed', type=float, default=1.0, help="playback speed with --render (default: 1.0)")
+    parser.add_argument('--level-pack', help="level pack the game was played with, if any")
+    args = parser.parse_args(argv)
+    if args.speed <= 0:
+        parser.error("--speed must be positive")
+    # Replays play in a window rather than taking over the screen
+    main.FULLSCREEN = False
+
+    start = time.perf_counter()
+    try:
+        game, matched, mismatch = replay(args.replay, args.render, args.speed, args.level_pack)
+    except ValueError as e:
+        print(f"Cannot replay: {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        print("Replay stopped", file=sys.stderr)
+        return 130
+    elapsed = time.perf_counter() - start
+
+    if mismatch is not None:
+        print(f"Replay diverged at tick {mismatch} ({mismatch / TICK_RATE:.2f}s), "
+              f"after {matched} matching state hashes", file=sys.stderr)
+        return 1
+    print(f"Replayed {game.ticks} ticks ({game.ticks / TICK_RATE:.1f} game seconds) in {elapsed:.2f}s; "
+          f"all {matched} state hashes matched", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
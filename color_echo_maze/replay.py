@@ -0,0 +1,85 @@
+"""Replay logs: a game's seed plus every key it was played with, tick by tick.
+
+Layout, little endian:
+
+    header   magic b'CERP', u16 version, u16 reserved, u64 game seed,
+             u32 tick rate, u32 maze width, u32 maze height (0 for the levels' own sizes)
+    records  u8 kind, u32 tick, u64 value
+
+A KEY record holds a pygame key code pressed after that many ticks had run,
+and a HASH record the game's state hash (GameManager.state_hash()) at that
+point, in the order the game saw them. Records are streamed to disk as the
+game is played, so a log cut short by a crash still replays up to its last
+complete record.
+"""
+import struct
+
+REPLAY_MAGIC = b'CERP'
+REPLAY_VERSION = 1
+REPLAY_HEADER = struct.Struct('<4sHHQIII')
+REPLAY_RECORD = struct.Struct('<BIQ')
+REPLAY_KEY = 1
+REPLAY_HASH = 2
+
+
+class ReplayRecorder:
+    """Streams a replay log to disk during play"""
+
+    def __init__(self, path, seed, tick_rate, maze_size=None):
+        width, height = maze_size or (0, 0)
+        self.path = path
+        self.file = open(path, 'wb')
+        self.file.write(REPLAY_HEADER.pack(REPLAY_MAGIC, REPLAY_VERSION, 0, seed, tick_rate, width, height))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def key(self, tick, key):
+        self.file.write(REPLAY_RECORD.pack(REPLAY_KEY, tick, key))
+
+    def hash(self, tick, state_hash):
+        self.file.write(REPLAY_RECORD.pack(REPLAY_HASH, tick, state_hash))
+        # Hashes come every second or so, which bounds what a crash can lose
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class ReplayReader:
+    """A replay log opened for playback; iterating it yields (kind, tick, value) records in order"""
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        header = self.file.read(REPLAY_HEADER.size)
+        if len(header) < REPLAY_HEADER.size:
+            self.file.close()
+            raise ValueError(f"{path} is too short to be a replay")
+        magic, version, _, self.seed, self.tick_rate, width, height = REPLAY_HEADER.unpack(header)
+        if magic != REPLAY_MAGIC:
+            self.file.close()
+            raise ValueError(f"{path} is not a replay")
+        if version != REPLAY_VERSION:
+            self.file.close()
+            raise ValueError(f"{path} is replay version {version}, expected {REPLAY_VERSION}")
+        self.maze_size = (width, height) if width else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __iter__(self):
+        while True:
+            record = self.file.read(REPLAY_RECORD.size)
+            # A partly written last record is dropped
+            if len(record) < REPLAY_RECORD.size:
+                return
+            yield REPLAY_RECORD.unpack(record)
+
+    def close(self):
+        self.file.close()